@@ -1,21 +1,13 @@
 import os
 
-from handlers import (
-    bully,
-    compliments,
-    honing,
-    images,
-    market,
-    render_display,
-    role_selector,
-    roles,
-    scheduler,
-    server_status,
-    vote,
-)
 from constants import interactions
-from utils import discord
 from constants.common import SCHEDULE_GROUP
+from constants.emojis import AvailabilityEmoji
+from utils import discord, dynamodb, idempotency, memo, metrics, registry
+from views import compliment_view, punch_view, role_selector_view, scheduler_view, vote_view
+
+# handler modules are only imported when a command/component routes to them
+load = registry.load_module
 
 # TODO: move this entire section to /constants'
 # text-only slash commands
@@ -33,73 +25,126 @@ SELECTOR_COMMANDS = ["make_raid"]
 RENDER_VIEW_COMMANDS = set([*BUTTON_COMMANDS, *SELECTOR_COMMANDS])
 
 
-# component interactions
-COMPONENT_HANDLERS = {
-    role_selector.is_role_button: role_selector.respond,
-    scheduler.is_schedule_button: scheduler.handle_button,
-    scheduler.is_schedule_selector: scheduler.handle_selector,
-    vote.is_vote_button: vote.handle_button,
-    bully.is_button: bully.handle_button,
-    compliments.is_button: compliments.handle_button,
-}
+def _git(info):
+    return f"Code lives at https://github.com/oozio/lost-ark-guild-bot; feel free to contribute!!"
 
 
-def handle_command(info):
-    server_id = info["server_id"]
-    user_id = info["user_id"]
-    channel_id = info["channel_id"]
+def _roles(info):
+    return load("handlers.roles").handle(
+        info["command"], info["options"], info["user_id"], info["server_id"]
+    )
+
+
+def _market(info):
+    return load("handlers.market").handle(info["command"], info["options"])
+
+
+def _honing(info):
+    return load("handlers.honing").handle(info["command"], info["options"])
+
+
+def _render_view(info):
+    return load("handlers.render_display").display(info["command"])(info)
+
+
+def _bully(info):
+    return load("handlers.bully").handle(info["command"], info)
+
+
+def _compliments(info):
+    return load("handlers.compliments").handle(info["command"], info)
+
+
+def _see_signups(info):
+    return {"embeds": [load("handlers.scheduler").get_all_user_commitments(info)]}
+
+
+def _change_time(info):
+    return load("handlers.scheduler").change_time(info, info["options"])
+
+
+def _server_status(info):
+    return load("handlers.server_status").handle(
+        info["command"], info["user_id"], info["channel_id"]
+    )
+
+
+def _images(info):
+    return load("handlers.images").handle(
+        info["command"], info["options"], info["channel_id"]
+    )
+
 
+# routing tables; duplicate or overlapping registrations fail at import
+COMMANDS = registry.Router("command")
+COMMANDS.add("git", _git)
+COMMANDS.add_all(ROLE_COMMANDS, _roles)
+COMMANDS.add_all(MARKET_COMMANDS, _market)
+COMMANDS.add_all(HONING_COMMANDS, _honing)
+# /punch and /compliment render UIs; the rest of these are text commands
+COMMANDS.add_all(set(RUDE_COMMANDS) - RENDER_VIEW_COMMANDS, _bully)
+COMMANDS.add_all(set(NICE_COMMANDS) - RENDER_VIEW_COMMANDS, _compliments)
+COMMANDS.add("see_signups", _see_signups)
+COMMANDS.add("change_time", _change_time)
+COMMANDS.add_all(SERVER_STATUS_COMMANDS, _server_status)
+COMMANDS.add_all(IMAGE_COMMANDS, _images)
+COMMANDS.add_all(RENDER_VIEW_COMMANDS, _render_view)
+
+# component interactions, by exact custom_id or by custom_id prefix
+SCHEDULE_BUTTON_IDS = [
+    *AvailabilityEmoji._member_names_,
+    *scheduler_view.ScheduleButtons.values(),
+    *scheduler_view.CalendarButtons.values(),
+]
+COMPONENTS = registry.Router("component")
+# (see_signups is on both the schedule and the calendar views)
+COMPONENTS.add_all(
+    SCHEDULE_BUTTON_IDS, registry.lazy("handlers.scheduler", "handle_button")
+)
+COMPONENTS.add(
+    scheduler_view.CLASS_SELECTOR_ID,
+    registry.lazy("handlers.scheduler", "handle_selector"),
+)
+COMPONENTS.add(
+    punch_view.PunchView.JOIN_ID, registry.lazy("handlers.bully", "handle_button")
+)
+COMPONENTS.add(
+    compliment_view.ComplimentView.JOIN_ID,
+    registry.lazy("handlers.compliments", "handle_button"),
+)
+role_button = registry.lazy("handlers.role_selector", "respond")
+COMPONENTS.add_prefix(role_selector_view.ADD_TEMPLATE.format(""), role_button)
+COMPONENTS.add_prefix(role_selector_view.RM_TEMPLATE.format(""), role_button)
+COMPONENTS.add_prefix(vote_view.ID_PREFIX, registry.lazy("handlers.vote", "handle_button"))
+
+
+def handle_command(info):
     command = info["command"]
-    options = info["options"]
-
-    if command == "git":
-        return f"Code lives at https://github.com/oozio/lost-ark-guild-bot; feel free to contribute!!"
-    elif command in ROLE_COMMANDS:
-        return roles.handle(command, options, user_id, server_id)
-    elif command in MARKET_COMMANDS:
-        return market.handle(command, options)
-    elif command in HONING_COMMANDS:
-        return honing.handle(command, options)
-    elif command in RENDER_VIEW_COMMANDS:
-        return render_display.display(command)(info)
-    elif command in RUDE_COMMANDS:
-        return bully.handle(command, info)
-    elif command in NICE_COMMANDS:
-        return compliments.handle(command, info)
-    elif command == "see_signups":
-        return {"embeds": [scheduler.get_all_user_commitments(info)]}
-    elif command == "change_time": 
-        return scheduler.change_time(info, options)
-    elif command in SERVER_STATUS_COMMANDS:
-        return server_status.handle(command, user_id, channel_id)
-    elif command in IMAGE_COMMANDS:
-        return images.handle(command, options, channel_id)
-    raise ValueError(f"Unrecognized command {command}, sad")
+
+    handler = COMMANDS.resolve(command)
+    if handler is None:
+        raise ValueError(f"Unrecognized command {command}, sad")
+    return handler(info)
 
 
 def handle_component_interaction(info):
     base_interaction = info["base_interaction_msg"]
     component_id = info["data"]["id"]
 
-    handler = [
-        func for is_match, func in COMPONENT_HANDLERS.items() if is_match(component_id)
-    ]
-
-    if handler:
-        assert len(handler) == 1, f"Duplicate handler found for `{component_id}`"
-        return handler[0](info)
-
-    raise ValueError(
-        f"Unrecognized component `{component_id}` from `/{base_interaction}`"
-    )
+    handler = COMPONENTS.resolve(component_id)
+    if handler is None:
+        raise ValueError(
+            f"Unrecognized component `{component_id}` from `/{base_interaction}`"
+        )
+    return handler(info)
 
 
 def handle_event(event):
     resources = event["resources"]
     if "arn:aws:events:us-east-2:391107963258:rule/Timer" in resources:
-        server_status.handle_timer()
+        load("handlers.server_status").handle_timer()
     elif "arn:aws:events:us-east-2:391107963258:rule/refresh_calendar" in resources:
-        scheduler._update_calendars(os.environ["SERVER_ID"])
+        load("handlers.scheduler")._update_calendars(os.environ["SERVER_ID"])
     elif SCHEDULE_GROUP in resources:
         thread_id = event["thread_id"]
         message = "@everyone starting in 15 min!"
@@ -108,7 +153,38 @@ def handle_event(event):
         print(f"Unknown event(s): {resources}")
 
 
+def _describe(event):
+    # (kind, name) of an invocation, for its metrics summary line
+    if event.get("source") == "aws.events":
+        return "event", ",".join(event.get("resources", []))
+
+    body = event["body-json"]
+    data = body.get("data", {})
+    if body["type"] == interactions.InteractionsType.APPLICATION_COMMAND:
+        return "command", data.get("name")
+    if body["type"] == interactions.InteractionsType.MESSAGE_COMPONENT:
+        return "component", data.get("custom_id")
+    return str(body["type"]), None
+
+
 def lambda_handler(event, context):
+    kind, name = _describe(event)
+    # identical dynamodb/discord reads within one invocation are only made once;
+    # every outbound call is timed and summarized in one log line at the end
+    with memo.scope(), metrics.invocation(name, kind, extra=_cache_stats):
+        return _handle_invocation(event)
+
+
+def _cache_stats():
+    return {
+        "memo": memo.stats(),
+        "item_cache": dynamodb.item_cache_stats(),
+        "member_cache": discord.member_cache_stats(),
+        "roles_cache": discord.roles_cache_stats(),
+    }
+
+
+def _handle_invocation(event):
     # Handle timer-triggered special cases
     if event.get("source") == "aws.events":
         handle_event(event)
@@ -121,6 +197,15 @@ def lambda_handler(event, context):
 
     interaction_token = body["token"]
 
+    # the processor can be invoked more than once for the same interaction; only
+    # the first invocation does the work (and talks to discord)
+    claim = idempotency.claim(body["id"])
+    if claim.duplicate:
+        metrics.count("duplicates")
+        state = "in progress" if claim.in_progress else "done"
+        print(f"Interaction {body['id']} is a repeat ({state} elsewhere); skipping")
+        return claim.result
+
     output = None
 
     # Handling an request can either succeed or fail.
@@ -154,6 +239,8 @@ def lambda_handler(event, context):
         discord.send_followup(
             application_id, interaction_token, f"Error: {e}", ephemeral=True
         )
+        # let lambda's retry do it over
+        idempotency.release(claim)
         raise e
 
     if not output:
@@ -166,6 +253,8 @@ def lambda_handler(event, context):
             response = discord.edit_message(
                 info["channel_id"], info["base_msg_id"], output
             )
+            # discord.py already waited out/retried the rate limit; this is only hit
+            # if the bucket stayed exhausted past discord.RATE_LIMIT_DEADLINE
             if response.status_code == 429:
                 reset_time = response.json()["retry_after"]
                 discord.send_followup(
@@ -180,3 +269,6 @@ def lambda_handler(event, context):
                 f"Don't know how to handle this interaction type: {interaction_type}",
                 ephemeral=True,
             )
+
+    idempotency.complete(claim, output)
+    return output
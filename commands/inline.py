@@ -0,0 +1,13 @@
+# Commands the dispatcher lambda may answer itself (type 4) instead of deferring
+# to the processor lambda, with how many seconds it gets to do so. Past the budget
+# (or on any error) the dispatcher falls back to the usual deferred path and the
+# processor runs the command again, so only put read-only commands in here.
+# The budget includes importing command_handler on a cold dispatcher and has to
+# leave room for the fallback inside discord's 3 second window.
+INLINE_COMMANDS = {
+    "git": 0.5,
+    "see_signups": 1.5,
+}
+
+# same, by component custom_id; answered with an UPDATE_MESSAGE (type 7)
+INLINE_COMPONENTS = {}
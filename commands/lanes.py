@@ -0,0 +1,37 @@
+from constants.interactions import InteractionsType
+
+# Which lane of the long-lived worker (worker.py) an event runs in. Each lane has
+# its own queue and threads, so a burst of slow commands can only back up their
+# own lane and never holds up button clicks or timer events.
+INTERACTIVE = "interactive"  # buttons and selects; users expect these instantly
+FAST = "fast"  # text commands that make a call or two
+HEAVY = "heavy"  # commands that take seconds (scrapes, image downloads, honing sims)
+BACKGROUND = "background"  # timer events from eventbridge
+
+# how many events of each lane run at once
+CONCURRENCY = {
+    INTERACTIVE: 4,
+    FAST: 2,
+    HEAVY: 1,
+    BACKGROUND: 1,
+}
+
+HEAVY_COMMANDS = {
+    "hone",
+    "server_status",
+    "maintenance_watch",
+    "nitro_react",
+    "nitro_message",
+}
+
+
+def lane_for(event) -> str:
+    if event.get("source") == "aws.events":
+        return BACKGROUND
+
+    body = event["body-json"]
+    if body["type"] == InteractionsType.MESSAGE_COMPONENT:
+        return INTERACTIVE
+    if body.get("data", {}).get("name") in HEAVY_COMMANDS:
+        return HEAVY
+    return FAST
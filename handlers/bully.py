@@ -26,6 +26,7 @@ MESSAGE_COLUMN = "message"
 VICTIM_COLUMN = "victim"
 CRIT_FAILS = "crit_fails"
 MAX_HP = 10
+JOIN_ATTEMPTS = 5
 
 # generic
 EMOTE_REGEX = r"(.*)\\(<.*:\d*>)(.*)"
@@ -54,6 +55,7 @@ class ReportHandler(CommandHandler):
     FIELDS = {"reporter": "user_id", "victim": "who", "reason": "why"}
 
     def _update_table(self):
+        # returns the victim's new tally
         dynamodb.increment_counter(
             TOXIC_INTERACTION_TABLE,
             PAIR_PKEY.format(self.reporter, self.victim),
@@ -64,20 +66,14 @@ class ReportHandler(CommandHandler):
             TOXIC_INTERACTION_TABLE, REPORTER_PKEY.format(self.reporter), TALLY_COLUMN
         )
 
-        dynamodb.increment_counter(
+        return dynamodb.increment_counter(
             TOXIC_INTERACTION_TABLE, VICTIM_PKEY.format(self.victim), TALLY_COLUMN
         )
 
-    def _get_victim_count(self):
-        return dynamodb.get_rows(
-            TOXIC_INTERACTION_TABLE, pkey_value=VICTIM_PKEY.format(self.victim)
-        )[0][TALLY_COLUMN]
-
     def handle(self):
         reason_str = f" for: {self._format_emotes(self.reason)}" if self.reason else ""
 
-        self._update_table()
-        victim_count = self._get_victim_count()
+        victim_count = self._update_table()
 
         message = f"{discord.mention_user(self.reporter)} reported {discord.mention_user(self.victim)}{'.' if not reason_str else ''}{reason_str}\n{discord.mention_user(self.victim)} has been reported {victim_count} {'time' if victim_count == 1 else 'times'}."
 
@@ -97,17 +93,26 @@ class PunchHandler(CommandHandler):
 
     def __init__(self, command, **kwargs) -> None:
         super().__init__(command, **kwargs)
+        self._rows = None
         if not self.victim:
             self.victim = self._get_interaction_victim()
 
+    def _get_rows(self):
+        # the phrase bank and this interaction's row, read together once up front
+        if self._rows is None:
+            self._rows = dynamodb.batch_get_rows(
+                TOXIC_INTERACTION_TABLE,
+                [PHRASES_PKEY, INTERACTION_PKEY.format(self.interaction_id)],
+            )
+        return self._rows
+
     def _get_interaction_victim(self):
-        return dynamodb.get_rows(
-            TOXIC_INTERACTION_TABLE,
-            pkey_value=INTERACTION_PKEY.format(self.interaction_id),
-        )[0][VICTIM_COLUMN]
+        return self._get_rows()[INTERACTION_PKEY.format(self.interaction_id)][
+            VICTIM_COLUMN
+        ]
 
     def _update_hp(self, dmg):
-        dynamodb.decrement_counter(
+        return dynamodb.decrement_counter(
             TOXIC_INTERACTION_TABLE,
             CHAR_PKEY.format(self.victim),
             HEALTH_COLUMN,
@@ -116,76 +121,65 @@ class PunchHandler(CommandHandler):
         )
 
     def _update_crit_fails(self):
-        dynamodb.increment_counter(
+        return dynamodb.increment_counter(
             TOXIC_INTERACTION_TABLE,
             CHAR_PKEY.format(self.puncher),
             CRIT_FAILS,
         )
 
     def _update_kda(self):
-        dynamodb.increment_counter(
+        # returns the puncher's kills and the victim's deaths after this one
+        kill_count = dynamodb.increment_counter(
             TOXIC_INTERACTION_TABLE,
             CHAR_PKEY.format(self.puncher),
             KILLS_COLUMN,
         )
 
-        dynamodb.increment_counter(
-            TOXIC_INTERACTION_TABLE, CHAR_PKEY.format(self.victim), DEATHS_COLUMN
-        )
-
-        dynamodb.set_rows(
+        # the victim respawns in the same update that counts the death
+        death_count = dynamodb.update_counters(
             TOXIC_INTERACTION_TABLE,
             CHAR_PKEY.format(self.victim),
-            {HEALTH_COLUMN: MAX_HP},
-        )
+            {DEATHS_COLUMN: 1},
+            set_columns={HEALTH_COLUMN: MAX_HP},
+        )[DEATHS_COLUMN]
+        return kill_count, death_count
 
-    def _record_punch(self, message):
+    def _record_punch(self, message, version=None):
         dynamodb.set_rows(
             TOXIC_INTERACTION_TABLE,
             INTERACTION_PKEY.format(self.interaction_id),
             {MESSAGE_COLUMN: message, VICTIM_COLUMN: self.victim},
+            version=version,
         )
 
-    def _get_victim_health(self):
-        return dynamodb.get_rows(
-            TOXIC_INTERACTION_TABLE, pkey_value=CHAR_PKEY.format(self.victim)
-        )[0][HEALTH_COLUMN]
-
-    def _get_victim_deaths(self):
-        try:
-            return dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE, pkey_value=CHAR_PKEY.format(self.victim)
-            )[0][DEATHS_COLUMN]
-        except:
-            return 0
-
-    def _get_kill_count(self):
-        try:
-            return dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE, pkey_value=CHAR_PKEY.format(self.puncher)
-            )[0][KILLS_COLUMN]
-        except:
-            return 0
-
-    def _get_crit_fails(self):
-        try:
-            return dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE, pkey_value=CHAR_PKEY.format(self.puncher)
-            )[0][CRIT_FAILS]
-        except:
-            return 0
-
     def _get_message(self):
-        try:
-            return dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE,
-                pkey_value=INTERACTION_PKEY.format(self.interaction_id),
-            )[0][MESSAGE_COLUMN]
-        except:
-            return ""
+        # (message, version); joins in other containers append to it too, so
+        # this is never answered from a cache
+        row, version = dynamodb.get_versioned_row(
+            TOXIC_INTERACTION_TABLE, INTERACTION_PKEY.format(self.interaction_id)
+        )
+        return (row or {}).get(MESSAGE_COLUMN, ""), version
+
+    def _join(self, message, puncher_mention):
+        # appends message to the interaction's and returns the whole thing; if
+        # someone else appended between our read and write, read it again
+        for attempt in range(JOIN_ATTEMPTS):
+            prev_msg, version = self._get_message()
+            prev_msg = prev_msg.strip()
+            if prev_msg:
+                prev_msg += f"\n{self.MESSAGE_DIVIDER}\n"
+                if puncher_mention not in prev_msg:
+                    prev_msg += f"{puncher_mention} is here.\n"
+
+            try:
+                self._record_punch(prev_msg + message, version)
+                return prev_msg + message
+            except dynamodb.StaleRowError:
+                if attempt == JOIN_ATTEMPTS - 1:
+                    raise
 
     def _get_phrases(self):
-        phrases = dynamodb.get_rows(TOXIC_INTERACTION_TABLE, pkey_value=PHRASES_PKEY)[0]
+        phrases = dict(self._get_rows()[PHRASES_PKEY])
 
         phrases.pop("pk")
         return list(phrases.values())
@@ -195,7 +189,7 @@ class PunchHandler(CommandHandler):
         victim_mention = discord.mention_user(self.victim)
 
         dmg = random.randrange(MAX_HP)
-        self._update_hp(dmg)
+        hp = self._update_hp(dmg)
 
         # format message
         phrase = random.choice(self._get_phrases())
@@ -205,22 +199,17 @@ class PunchHandler(CommandHandler):
             infinity = "\u221e"
             message = f"""{puncher_mention} has a big head.\n{puncher_mention} has died {infinity} times."""
         else:
-            hp = self._get_victim_health()
             death_msg = ""
 
             if hp <= 0:
-                self._update_kda()
-
-                death_count = self._get_victim_deaths()
-                kill_count = self._get_kill_count()
+                kill_count, death_count = self._update_kda()
 
                 death_msg = f"""
                 {victim_mention} has died {death_count} time{'s' if death_count != 1 else ''}.
                 {puncher_mention} has killed someone {kill_count} time{'s' if kill_count != 1 else ''}."""
 
             if not dmg:
-                self._update_crit_fails()
-                crit_fails = self._get_crit_fails()
+                crit_fails = self._update_crit_fails()
 
                 message = f"""{puncher_mention} {phrase} {victim_mention} {PUNCH_EMOTE} for {dmg} damage.
                 LOL
@@ -235,15 +224,9 @@ class PunchHandler(CommandHandler):
                 message += f"y r u hitting urself"
 
         if self.command == punch_view.PunchView.JOIN_ID:
-            prev_msg = self._get_message().strip()
-            if prev_msg:
-                prev_msg += f"\n{self.MESSAGE_DIVIDER}\n"
-                if puncher_mention not in prev_msg:
-                    prev_msg += f"{puncher_mention} is here.\n"
-
-            message = prev_msg + message
-
-        self._record_punch(message)
+            message = self._join(message, puncher_mention)
+        else:
+            self._record_punch(message)
 
         dots = ""
         # there's a max length; remove previous messages
@@ -309,7 +292,3 @@ def handle_button(info):
     if button == punch_view.PunchView.JOIN_ID:
         handler = handler_map["punch"](command=button, **info)
         return handler.handle()
-
-
-def is_button(component_id):
-    return component_id in [punch_view.PunchView.JOIN_ID]
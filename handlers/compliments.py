@@ -32,28 +32,26 @@ MESSAGE_COLUMN = "message"
 VICTIM_COLUMN = "victim"
 PERP_COUNT_COLUMN = "perp_count"
 TRANSITIVITY_COLUMN = "is_transitive"
+JOIN_ATTEMPTS = 5
 
 
 class BaseComplimentsHandler(CommandHandler):
-    def _get_max_id(self):
-        max_id_info = dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE,
-                pkey_value=PPS_MAX_ID_PK.format(pps=self.pps),
-            )
-        if not max_id_info:
-            return 0
-        else:
-            return max_id_info[0][MAX_ID_COL]
-
     def _increment_max_id(self):
-        dynamodb.increment_counter(TOXIC_INTERACTION_TABLE, PPS_MAX_ID_PK.format(pps=self.pps), MAX_ID_COL)
+        # returns the new max id, so two concurrent adds never get the same one
+        return dynamodb.increment_counter(TOXIC_INTERACTION_TABLE, PPS_MAX_ID_PK.format(pps=self.pps), MAX_ID_COL)
 
     def _get_words_by_pps(self, pps: str):
-        return dynamodb.get_rows(
-            TOXIC_INTERACTION_TABLE,
-            filterExpression=f"contains (pk, :pk)",
-            expressionAttributeValues={":pk": f"pps:{pps}"},
-        )
+        # one scan for the whole wordbank, instead of one per part of speech
+        if getattr(self, "_words", None) is None:
+            self._words = {}
+            for word in dynamodb.get_rows(
+                TOXIC_INTERACTION_TABLE,
+                filterExpression=f"contains (pk, :pk)",
+                expressionAttributeValues={":pk": "_pps:"},
+                projection=[WORD_COLUMN, PART_COLUMN, TRANSITIVITY_COLUMN],
+            ):
+                self._words.setdefault(word.get(PART_COLUMN), []).append(word)
+        return self._words.get(pps, [])
 
 
 class ComplimentHandler(BaseComplimentsHandler):
@@ -78,21 +76,36 @@ class ComplimentHandler(BaseComplimentsHandler):
             pkey_value=INTERACTION_PKEY.format(self.interaction_id),
         )[0][VICTIM_COLUMN]
 
-    def _record_compliment(self, message):
+    def _record_compliment(self, message, version=None):
         dynamodb.set_rows(
             TOXIC_INTERACTION_TABLE,
             INTERACTION_PKEY.format(self.interaction_id),
             {MESSAGE_COLUMN: message, VICTIM_COLUMN: self.victim},
+            version=version,
         )
 
     def _get_message(self):
-        try:
-            return dynamodb.get_rows(
-                TOXIC_INTERACTION_TABLE,
-                pkey_value=INTERACTION_PKEY.format(self.interaction_id),
-            )[0][MESSAGE_COLUMN]
-        except:
-            return ""
+        # (message, version), as in bully.PunchHandler
+        row, version = dynamodb.get_versioned_row(
+            TOXIC_INTERACTION_TABLE, INTERACTION_PKEY.format(self.interaction_id)
+        )
+        return (row or {}).get(MESSAGE_COLUMN, ""), version
+
+    def _join(self, message, perp_mention):
+        for attempt in range(JOIN_ATTEMPTS):
+            prev_msg, version = self._get_message()
+            prev_msg = prev_msg.strip()
+            if prev_msg:
+                prev_msg += f"\n{self.MESSAGE_DIVIDER}\n"
+                if perp_mention not in prev_msg:
+                    prev_msg += f"{perp_mention} is here.\n"
+
+            try:
+                self._record_compliment(prev_msg + message, version)
+                return prev_msg + message
+            except dynamodb.StaleRowError:
+                if attempt == JOIN_ATTEMPTS - 1:
+                    raise
 
     def _get_phrase(self, victim_mention):
         verbs = self._get_words_by_pps(PartsOfSpeech.VERB)
@@ -155,15 +168,9 @@ class ComplimentHandler(BaseComplimentsHandler):
         
 
         if self.command == compliment_view.ComplimentView.JOIN_ID:
-            prev_msg = self._get_message().strip()
-            if prev_msg:
-                prev_msg += f"\n{self.MESSAGE_DIVIDER}\n"
-                if perp_mention not in prev_msg:
-                    prev_msg += f"{perp_mention} is here.\n"
-
-            message = prev_msg + message
-        
-        self._record_compliment(message)
+            message = self._join(message, perp_mention)
+        else:
+            self._record_compliment(message)
 
         dots = ""
         # there's a max length; remove previous messages
@@ -193,8 +200,7 @@ class WordHandler(BaseComplimentsHandler):
     FIELDS = {"word": "word", "pps": "pps", "is_transitive": "is_transitive"}
 
     def handle(self):
-        next_id = self._get_max_id() + 1
-        self._increment_max_id()
+        next_id = self._increment_max_id()
 
         dynamodb.set_rows(
             TOXIC_INTERACTION_TABLE, PK.format(word=self.word, pps=self.pps, id=next_id), {ID_COLUMN: next_id, PART_COLUMN: self.pps, WORD_COLUMN: self.word, TRANSITIVITY_COLUMN: self.is_transitive}
@@ -231,7 +237,3 @@ def handle_button(info):
     if button == compliment_view.ComplimentView.JOIN_ID:
         handler = handler_map["compliment"](command=button, **info)
         return handler.handle()
-
-
-def is_button(component_id):
-    return component_id in [compliment_view.ComplimentView.JOIN_ID]
@@ -1,14 +1,15 @@
-from . import bully, compliments, role_selector, scheduler, vote
+from utils import registry
 
 # TODO: bad that commands are defined in multiple places
 
+# handler modules are imported on first use; see utils/registry.py
 CMD_DISPLAYS = {
-    "role_selector": role_selector.display,
-    "make_raid": scheduler.display,
-    "calendar": scheduler.display,
-    "vote": vote.display,
-    "punch": bully.display,
-    "compliment": compliments.display
+    "role_selector": registry.lazy("handlers.role_selector", "display"),
+    "make_raid": registry.lazy("handlers.scheduler", "display"),
+    "calendar": registry.lazy("handlers.scheduler", "display"),
+    "vote": registry.lazy("handlers.vote", "display"),
+    "punch": registry.lazy("handlers.bully", "display"),
+    "compliment": registry.lazy("handlers.compliments", "display"),
 }
 
 
@@ -18,10 +18,6 @@ def _pretty_roles(role_ids):
     return " ".join([_pretty_role(role_id) for role_id in role_ids])
 
 
-def is_role_button(component_id):
-    return "role" in component_id
-
-
 def display(info):
     # TODO: add logic for different types of roles
     role_selector = RoleSelectorView(info["server_id"])
@@ -61,6 +57,7 @@ def display(info):
             "components": buttons,
         }
 
+        # one after the other, so the add panel always comes first
         discord.post_message_in_channel(info["channel_id"], output)
 
 
@@ -71,9 +68,9 @@ def respond(info):
 
     role_requested = data["id"].split("_role__")[-1]
 
-    role_id = list(discord._get_role_ids_by_name(server_id, [role_requested]).values())[
-        0
-    ]
+    role_id = discord._get_role_ids_by_name(server_id, [role_requested])[role_requested]
+    if role_id is None:
+        raise ValueError(f"Couldn't find a role named `{role_requested}`")
 
     output = "Something broke while trying to change roles. Let <@Bot Dev> know"
     if "___add_role__" in data["id"]:
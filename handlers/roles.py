@@ -1,4 +1,6 @@
-from utils import discord
+import functools
+
+from utils import discord, discord_async
 
 
 def _pretty_role(role_id):
@@ -14,18 +16,26 @@ def handle(command, cmd_input, user_id, server_id):
         roles_seen = []
         for _, role in cmd_input.items():
             if role not in roles_seen:
-                discord.add_role(user_id, role, server_id)
                 roles_seen.append(role)
 
+        discord_async.fan_out(
+            functools.partial(discord.add_role, user_id, role, server_id)
+            for role in roles_seen
+        )
+
         return f"Roles {_pretty_roles(roles_seen)} have been added.\nAll current roles: {_pretty_roles(discord.get_user_role_ids(server_id, user_id))}"
 
     elif command == "remove_roles":
         roles_seen = []
         for _, role in cmd_input.items():
             if role not in roles_seen:
-                discord.remove_role(user_id, role, server_id)
                 roles_seen.append(role)
 
+        discord_async.fan_out(
+            functools.partial(discord.remove_role, user_id, role, server_id)
+            for role in roles_seen
+        )
+
         return f"Roles {_pretty_roles(cmd_input.values())} have been removed.\n All current roles: {_pretty_roles(discord.get_user_role_ids(server_id, user_id))}"
 
     else:
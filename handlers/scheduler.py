@@ -1,3 +1,4 @@
+import functools
 import os
 import re
 import time
@@ -6,7 +7,7 @@ from datetime import datetime, tzinfo, timedelta
 from dateutil import parser
 
 from views import scheduler_view
-from utils import discord, dynamodb, eventbridge
+from utils import coalesce, discord, discord_async, dynamodb, eventbridge
 
 os.putenv("TZ", "America/Los_Angeles")
 time.tzset()
@@ -44,6 +45,18 @@ USER_INDEX = "user_id-index"
 # track calendar posts
 CALENDAR_PKEY = "calendar:{}"
 
+# event infos and calendar posts say what they are, so they can be queried
+# (record_type-index, hash key record_type) instead of scanned for by pk.
+# Signups never set record_type: they're never read that way, and leaving them
+# out keeps the index small and off a hot partition.
+RECORD_TYPE_COLUMN = "record_type"
+RECORD_TYPE_INDEX = "record_type-index"
+EVENT_INFO_RECORD = "event_info"
+CALENDAR_RECORD = "calendar"
+# written by scripts/backfill_record_type.py once every older event info and
+# calendar post has a record_type
+RECORD_TYPE_MARKER_PKEY = "migration:record_type"
+
 # class table schema = "lost_ark_sc
 CLASS_PKEY = "user_class"
 
@@ -249,11 +262,66 @@ def _is_event_full(event_id: str, event_name: str) -> bool:
     return False
 
 
-def _get_calendar_posts():
+def record_type_for(pkey: str):
+    # the record_type a row written before record_type existed should have,
+    # going by its pk; None for rows that stay out of the index
+    if pkey.startswith(CALENDAR_PKEY.format("")):
+        return CALENDAR_RECORD
+    if pkey.startswith("event:") and "user:" not in pkey and pkey.endswith("info"):
+        return EVENT_INFO_RECORD
+    return None
+
+
+_record_types_ready = False
+
+
+def _use_record_type_index() -> bool:
+    # the marker never goes away once it's there, so stop checking after that
+    global _record_types_ready
+    if not _record_types_ready:
+        _record_types_ready = bool(
+            dynamodb.get_rows(SCHEDULE_TABLE, RECORD_TYPE_MARKER_PKEY)
+        )
+    return _record_types_ready
+
+
+def _get_records(record_type: str, pkey_fragment: str, projection: list):
+    if _use_record_type_index():
+        return dynamodb.query_index(
+            SCHEDULE_TABLE,
+            RECORD_TYPE_INDEX,
+            {RECORD_TYPE_COLUMN: record_type},
+            projection=projection,
+        )
+
+    # not backfilled yet: older rows can only be found by their pk
     return dynamodb.get_rows(
         SCHEDULE_TABLE,
-        filterExpression=f"contains ({PKEY}, :calendar)",
-        expressionAttributeValues={":calendar": "calendar"},
+        filterExpression=f"contains ({PKEY}, :fragment)",
+        expressionAttributeValues={":fragment": pkey_fragment},
+        projection=projection,
+    )
+
+
+def _get_calendar_posts():
+    return _get_records(CALENDAR_RECORD, "calendar", [CHANNEL_COLUMN, MESSAGE_COLUMN])
+
+
+def _get_event_infos():
+    # what calendar_embed needs
+    return _get_records(
+        EVENT_INFO_RECORD,
+        "info",
+        [
+            EVENT_ID_COLUMN,
+            EVENT_TYPE_COLUMN,
+            CHANNEL_COLUMN,
+            CHANNEL_NAME_COLUMN,
+            MESSAGE_COLUMN,
+            THREAD_COLUMN,
+            TIME_COLUMN,
+            USER_COLUMN,
+        ],
     )
 
 
@@ -264,16 +332,16 @@ def _update_calendars(server_id):
         "components": scheduler_view.CalendarView().components,
     }
     calendar_posts = _get_calendar_posts()
-    for post in calendar_posts:
-        discord.edit_message(post[CHANNEL_COLUMN], post[MESSAGE_COLUMN], new_calendar)
+    discord_async.fan_out(
+        functools.partial(
+            discord.edit_message, post[CHANNEL_COLUMN], post[MESSAGE_COLUMN], new_calendar
+        )
+        for post in calendar_posts
+    )
 
 
 def calendar_embed(server_id: str) -> dict:
-    all_rows = dynamodb.get_rows(
-        SCHEDULE_TABLE,
-        filterExpression=f"contains ({PKEY}, :info)",
-        expressionAttributeValues={":info": "info"},
-    )
+    all_rows = _get_event_infos()
 
     events = []
     seen = []
@@ -348,6 +416,7 @@ def schedule_embed(event_id: str, server_id, is_full=False) -> dict:
         EVENT_ID_INDEX,
         {EVENT_ID_COLUMN: event_id},
         filterExpression=f"attribute_exists({STATUS_COLUMN})",
+        projection=[STATUS_COLUMN, USER_COLUMN, CLASS_COLUMN],
     )
 
     statuses = {state.name: "" for state in AvailabilityEmoji}
@@ -396,6 +465,17 @@ def schedule_embed(event_id: str, server_id, is_full=False) -> dict:
     }
 
 
+# what get_all_user_commitments needs from each signup
+USER_EVENT_COLUMNS = [
+    SERVER_COLUMN,
+    CHANNEL_COLUMN,
+    MESSAGE_COLUMN,
+    TIME_COLUMN,
+    EVENT_TYPE_COLUMN,
+    EVENT_ID_COLUMN,
+]
+
+
 def get_all_user_commitments(info):
     user_id = info[USER_COLUMN]
     user_events = {}
@@ -407,6 +487,7 @@ def get_all_user_commitments(info):
         expressionAttributeValues={
             f":{STATUS_COLUMN}": AvailabilityEmoji.COMING.name,
         },
+        projection=USER_EVENT_COLUMNS,
     )
 
     user_events[AvailabilityEmoji.MAYBE.name] = dynamodb.query_index(
@@ -417,6 +498,7 @@ def get_all_user_commitments(info):
         expressionAttributeValues={
             f":{STATUS_COLUMN}": AvailabilityEmoji.MAYBE.name,
         },
+        projection=USER_EVENT_COLUMNS,
     )
 
     fields = []
@@ -489,6 +571,7 @@ def _tally_classes(event_id):
         expressionAttributeValues={
             f":{STATUS_COLUMN}": AvailabilityEmoji.COMING.name,
         },
+        projection=[CLASS_COLUMN],
     )
 
     dps = 0
@@ -546,6 +629,14 @@ def change_time_prompt(event_id, event_type, new_time=None):
     }
 
 
+def _schedule_message(event_id, server_id, channel_name):
+    is_full = _is_event_full(event_id, channel_name)
+    return {
+        "embeds": [schedule_embed(event_id, server_id, is_full=is_full)],
+        "components": scheduler_view.SchedulerView(is_full=is_full).components,
+    }
+
+
 def _update_schedule(event_type, user, event_id, **kwargs):
     cols = {EVENT_TYPE_COLUMN: event_type, EVENT_ID_COLUMN: event_id, USER_COLUMN: user}
 
@@ -587,6 +678,7 @@ def _create_event(
             CHANNEL_NAME_COLUMN: discord.get_channel_by_id(channel_id)["name"],
             THREAD_COLUMN: thread_id,
             DESCRIPTION_COLUMN: description,
+            RECORD_TYPE_COLUMN: EVENT_INFO_RECORD,
         },
     )
 
@@ -598,6 +690,7 @@ def _log_calendar_post(interaction_id, channel_id, message_id):
         {
             MESSAGE_COLUMN: message_id,
             CHANNEL_COLUMN: channel_id,
+            RECORD_TYPE_COLUMN: CALENDAR_RECORD,
         },
     )
 
@@ -756,18 +849,6 @@ def display(info: dict) -> dict:
         raise ValueError(f"Unrecognized command: {cmd}")
 
 
-def is_schedule_button(component_id):
-    return (
-        component_id in AvailabilityEmoji._member_names_
-        or component_id in scheduler_view.ScheduleButtons.values()
-        or component_id in scheduler_view.CalendarButtons.values()
-    )
-
-
-def is_schedule_selector(component_id):
-    return component_id == scheduler_view.CLASS_SELECTOR_ID
-
-
 def change_time(info, options):
     server_id = info["server_id"]
     event_id = options[EVENT_ID_COLUMN]
@@ -818,11 +899,7 @@ def change_time(info, options):
     eventbridge.change_reminder(id=event_info[THREAD_COLUMN], timestamp=new_time-timedelta(minutes=REMINDER_TIME))
 
     # refresh original message status
-    is_full = _is_event_full(event_id, event_info[CHANNEL_NAME_COLUMN])
-    new_msg = {
-        "embeds": [schedule_embed(event_id, server_id, is_full=is_full)],
-        "components": scheduler_view.SchedulerView(is_full=is_full).components,
-    }
+    new_msg = _schedule_message(event_id, server_id, event_info[CHANNEL_NAME_COLUMN])
     _update_calendars(server_id)
     response = discord.edit_message(
                 event_info[CHANNEL_COLUMN], event_info[MESSAGE_COLUMN], new_msg
@@ -864,20 +941,17 @@ def handle_button(info):
             },
         )
 
-        is_full = _is_event_full(event_id, event_info[CHANNEL_NAME_COLUMN])
-
-        new_msg = {
-            "embeds": [schedule_embed(event_id, server_id, is_full=is_full)],
-            "components": scheduler_view.SchedulerView(is_full=is_full).components,
-        }
-
         if button == AvailabilityEmoji.NOT_COMING.name:
             discord.remove_thread_member(thread_id, user_id)
         else:
             discord.add_thread_member(thread_id, user_id)
 
-        _update_calendars(server_id)
-        return new_msg
+        def render():
+            # the calendars only need refreshing once per burst too
+            _update_calendars(server_id)
+            return _schedule_message(event_id, server_id, event_info[CHANNEL_NAME_COLUMN])
+
+        return coalesce.latest_render(base_channel_id, message_id, render)
 
     elif button == scheduler_view.ScheduleButtons.ADD_TO_CALENDAR:
         resp = _add_event_to_calendar(event_id, server_id)
@@ -895,12 +969,7 @@ def handle_button(info):
         event_type = event_info[EVENT_TYPE_COLUMN]
 
         # refresh original message status
-        is_full = _is_event_full(event_id, event_info[CHANNEL_NAME_COLUMN])
-        new_msg = {
-            "embeds": [schedule_embed(event_id, server_id, is_full=is_full)],
-            "components": scheduler_view.SchedulerView(is_full=is_full).components,
-        }
-        return new_msg
+        return _schedule_message(event_id, server_id, event_info[CHANNEL_NAME_COLUMN])
     elif button == scheduler_view.ScheduleButtons.CHANGE_TIME:
         event_info = dynamodb.get_rows(
             SCHEDULE_TABLE, pkey_value=EVENT_INFO_PKEY.format(event_id)
@@ -949,11 +1018,8 @@ def handle_selector(info):
         SCHEDULE_TABLE, pkey_value=EVENT_INFO_PKEY.format(event_id)
     )[0]
 
-    event_type = event_info[EVENT_TYPE_COLUMN]
-
-    is_full = _is_event_full(event_id, event_info[CHANNEL_NAME_COLUMN])
-    new_msg = {
-        "embeds": [schedule_embed(event_id, server_id, is_full=is_full)],
-        "components": scheduler_view.SchedulerView(is_full=is_full).components,
-    }
-    return new_msg
+    return coalesce.latest_render(
+        info["base_channel_id"],
+        info["base_msg_id"],
+        lambda: _schedule_message(event_id, server_id, event_info[CHANNEL_NAME_COLUMN]),
+    )
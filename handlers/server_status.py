@@ -6,6 +6,7 @@ SERVER = 'Bergstrom'
 BOT_TESTING = '985659954532847646'
 MAIN = '951040587266662402'
 SPAM = '951409442593865748'
+STATUS_URL = 'https://www.playlostark.com/en-us/support/server-status'
 
 # Looks through all server statuses, looking for the SERVER keyword, then goes up
 # a level and looks for MAINTENANCE_CLASS, which is the class assigned to the
@@ -16,7 +17,7 @@ SPAM = '951409442593865748'
 def is_maintenance():
     MAINTENANCE_CLASS = 'ags-ServerStatus-content-responses-response-server-status--maintenance'
 
-    response = requests.get('https://www.playlostark.com/en-us/support/server-status', timeout=15)
+    response = requests.get(STATUS_URL, timeout=15)
     html = BeautifulSoup(response.text, 'html.parser')
 
     statuses = html.select('.ags-ServerStatus-content-responses > div.ags-ServerStatus-content-responses-response')
@@ -3,7 +3,7 @@ import re
 
 from time import sleep
 
-from utils import discord, dynamodb
+from utils import coalesce, discord, dynamodb
 from views import vote_view
 
 VOTES_TABLE = "lost_ark_generic"
@@ -65,7 +65,7 @@ def _get_vote_embed(interaction_id):
             vote_fields.append(
                 {
                     "name": pretty_label,
-                    "value": int(value),
+                    "value": str(int(value)),
                     "inline": True,
                 }
             )
@@ -112,10 +112,6 @@ def display(info: dict) -> dict:
         raise ValueError(f"Unrecognized command: {cmd}")
 
 
-def is_vote_button(component_id):
-    return _is_vote_column(component_id)
-
-
 def handle_button(info):
     interaction_id = info["base_interaction_id"]
     base_channel_id = info["base_channel_id"]
@@ -131,6 +127,8 @@ def handle_button(info):
         if pretty == choice:
             _update_votes(interaction_id, sanitized)
 
-    new_msg = {"embeds": [_get_vote_embed(interaction_id)]}
-
-    return new_msg
+    return coalesce.latest_render(
+        base_channel_id,
+        message_id,
+        lambda: {"embeds": [_get_vote_embed(interaction_id)]},
+    )
@@ -1,30 +1,40 @@
-import json
-import boto3
-import requests
-
+# Dispatcher lambda: check the signature, hand the interaction to the processor
+# lambda, and ack discord within its 3 second window. Keep imports to what that
+# needs; everything else belongs in command_handler.py.
 from constants import interactions
-from utils import discord, aws_lambda
+from utils import aws_lambda, dispatch, metrics
 
 from commands.visibility import SHOULD_HIDE_COMMAND_OUTPUT
 
+# parse the public key during init rather than on the first request; its own
+# metrics line says how long the secret took and where it came from
+with metrics.invocation("init", "dispatcher"):
+    dispatch.verify_key()
+
 
 def lambda_handler(event, context):
     # handle discord's integrity check
-    pong = discord.check_input(event)
+    pong = dispatch.check_input(event)
     if pong:
         return pong
 
+    body = event["body-json"]
+    interaction_type = body["type"]
+
+    # cheap read-only commands (commands/inline.py) are answered right here,
+    # skipping the processor hop and the followup PATCH
+    ephemeral = True
+    if interaction_type == interactions.InteractionsType.APPLICATION_COMMAND:
+        ephemeral = SHOULD_HIDE_COMMAND_OUTPUT.get(body["data"]["name"], True)
+    answer = dispatch.answer_inline(body, ephemeral=ephemeral)
+    if answer:
+        return answer
+
     # pass event to processor
     aws_lambda.invoke_processor(event)
 
-    interaction_type = event["body-json"]["type"] 
-
     if interaction_type == interactions.InteractionsType.MESSAGE_COMPONENT:
-        return discord.initial_response("DEFERRED_UPDATE_MESSAGE")
+        return dispatch.initial_response("DEFERRED_UPDATE_MESSAGE")
     elif interaction_type == interactions.InteractionsType.APPLICATION_COMMAND:
-        command = event["body-json"]["data"]["name"]
-        
         # return :thinking:
-        return discord.initial_response('ACK_WITH_SOURCE',
-                                        ephemeral=SHOULD_HIDE_COMMAND_OUTPUT.get(
-                                            command, True))
+        return dispatch.initial_response('ACK_WITH_SOURCE', ephemeral=ephemeral)
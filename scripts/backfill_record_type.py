@@ -0,0 +1,198 @@
+"""Backfills record_type on lost_ark_schedule rows and switches reads to its index.
+
+The processor writes record_type on every new row already, so this only has to
+cover older rows, and can run while the bot is up:
+
+    python scripts/backfill_record_type.py --create-index
+    python scripts/backfill_record_type.py --segments 4
+
+1. (--create-index) adds record_type-index to the table and waits for it.
+2. scans for event infos and calendar posts without a record_type and sets it
+   from the pk; each update is conditional, so rows deleted or rewritten in the
+   meantime are left alone. Signups and anything else stay out of the index.
+3. drops record_type from signups that were written with one, so the index
+   only holds what's queried through it.
+4. once no event info or calendar post is left and the index is ACTIVE, writes
+   the marker row that makes handlers/scheduler.py query the index instead of
+   scanning.
+
+Rerunning it is safe; --dry-run only reports what it would do.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+
+from botocore.exceptions import ClientError
+
+from handlers import scheduler
+from utils import dynamodb
+
+TABLE = scheduler.SCHEDULE_TABLE
+MISSING_FILTER = f"attribute_not_exists({scheduler.RECORD_TYPE_COLUMN})"
+# what signups were tagged with before they were left out of the index
+SIGNUP_RECORD = "commitment"
+SIGNUP_FILTER = f"{scheduler.RECORD_TYPE_COLUMN} = :t"
+INDEX_POLL_INTERVAL = 15  # seconds
+
+
+def _index_status(client):
+    table = client.describe_table(TableName=TABLE)["Table"]
+    for index in table.get("GlobalSecondaryIndexes", []):
+        if index["IndexName"] == scheduler.RECORD_TYPE_INDEX:
+            return index["IndexStatus"]
+    return None
+
+
+def create_index(client):
+    if _index_status(client) is None:
+        print(f"Creating {scheduler.RECORD_TYPE_INDEX}")
+        client.update_table(
+            TableName=TABLE,
+            AttributeDefinitions=[
+                {"AttributeName": scheduler.RECORD_TYPE_COLUMN, "AttributeType": "S"}
+            ],
+            GlobalSecondaryIndexUpdates=[
+                {
+                    "Create": {
+                        "IndexName": scheduler.RECORD_TYPE_INDEX,
+                        "KeySchema": [
+                            {"AttributeName": scheduler.RECORD_TYPE_COLUMN, "KeyType": "HASH"}
+                        ],
+                        "Projection": {"ProjectionType": "ALL"},
+                    }
+                }
+            ],
+        )
+
+    while _index_status(client) != "ACTIVE":
+        print(f"Waiting for {scheduler.RECORD_TYPE_INDEX} ({_index_status(client)})")
+        time.sleep(INDEX_POLL_INTERVAL)
+
+
+def backfill(segments=1, page_size=None, dry_run=False):
+    """Sets record_type where it's missing; returns counts per outcome."""
+    table = dynamodb.dynamodb_client.Table(TABLE)
+    counts = {"updated": 0, "skipped": 0, "not_indexed": 0}
+
+    for row in dynamodb.iter_scan(
+        TABLE, MISSING_FILTER, page_size=page_size, segments=segments
+    ):
+        record_type = scheduler.record_type_for(row[dynamodb.PKEY_NAME])
+        if record_type is None:
+            # signups, the marker, ...
+            counts["not_indexed"] += 1
+            continue
+        if dry_run:
+            counts["updated"] += 1
+            continue
+
+        try:
+            table.update_item(
+                Key={dynamodb.PKEY_NAME: row[dynamodb.PKEY_NAME]},
+                UpdateExpression="SET #t = :t",
+                # don't resurrect deleted rows or overwrite a fresh write
+                ConditionExpression="attribute_exists(#pk) AND attribute_not_exists(#t)",
+                ExpressionAttributeNames={
+                    "#t": scheduler.RECORD_TYPE_COLUMN,
+                    "#pk": dynamodb.PKEY_NAME,
+                },
+                ExpressionAttributeValues={":t": record_type},
+            )
+            counts["updated"] += 1
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            counts["skipped"] += 1
+
+    return counts
+
+
+def unindex_signups(segments=1, page_size=None, dry_run=False):
+    """Removes record_type from signups tagged with one; returns how many."""
+    table = dynamodb.dynamodb_client.Table(TABLE)
+    removed = 0
+
+    for row in dynamodb.iter_scan(
+        TABLE,
+        SIGNUP_FILTER,
+        {":t": SIGNUP_RECORD},
+        page_size=page_size,
+        segments=segments,
+        projection=[dynamodb.PKEY_NAME],
+    ):
+        if not dry_run:
+            try:
+                table.update_item(
+                    Key={dynamodb.PKEY_NAME: row[dynamodb.PKEY_NAME]},
+                    UpdateExpression="REMOVE #t",
+                    ConditionExpression="#t = :t",
+                    ExpressionAttributeNames={"#t": scheduler.RECORD_TYPE_COLUMN},
+                    ExpressionAttributeValues={":t": SIGNUP_RECORD},
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                continue
+        removed += 1
+
+    return removed
+
+
+def remaining(segments=1):
+    """Event infos and calendar posts that still have no record_type."""
+    return [
+        row[dynamodb.PKEY_NAME]
+        for row in dynamodb.iter_scan(
+            TABLE, MISSING_FILTER, segments=segments, projection=[dynamodb.PKEY_NAME]
+        )
+        if scheduler.record_type_for(row[dynamodb.PKEY_NAME]) is not None
+    ]
+
+
+def mark_ready():
+    dynamodb.set_rows(
+        TABLE,
+        scheduler.RECORD_TYPE_MARKER_PKEY,
+        {"completed_at": datetime.datetime.utcnow().isoformat()},
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--segments", type=int, default=1)
+    arg_parser.add_argument("--page-size", type=int)
+    arg_parser.add_argument("--create-index", action="store_true")
+    arg_parser.add_argument("--dry-run", action="store_true")
+    args = arg_parser.parse_args()
+
+    client = dynamodb.dynamodb_client.meta.client
+    if args.create_index and not args.dry_run:
+        create_index(client)
+
+    counts = backfill(args.segments, args.page_size, args.dry_run)
+    print(f"Backfill: {counts}")
+    removed = unindex_signups(args.segments, args.page_size, args.dry_run)
+    print(f"Signups taken out of the index: {removed}")
+    if args.dry_run:
+        return
+
+    left = remaining(args.segments)
+    if left:
+        print(f"{len(left)} rows still have no record_type, not switching reads: {left[:10]}")
+        sys.exit(1)
+    if _index_status(client) != "ACTIVE":
+        print(f"{scheduler.RECORD_TYPE_INDEX} isn't ACTIVE yet, not switching reads")
+        sys.exit(1)
+
+    mark_ready()
+    print("Done; the scheduler now reads event infos and calendar posts from the index")
+
+
+if __name__ == "__main__":
+    main()
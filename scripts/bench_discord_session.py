@@ -0,0 +1,82 @@
+"""Per-call latency of bare `requests` calls vs the pooled discord session.
+
+Runs against a local fake discord endpoint, so no token or network is needed:
+
+    python scripts/bench_discord_session.py --calls 200 --connect-latency 0.03
+
+--connect-latency is slept once per new TCP connection to stand in for the
+TLS handshake that every bare `requests.get` pays against discord.com.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from scripts.fake_discord import FakeDiscord
+from utils import http
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _time_calls(call, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        call().json()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _summarize(samples, connections):
+    return {
+        "calls": len(samples),
+        "connections": connections,
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+    }
+
+
+def run(calls, connect_latency, request_latency):
+    results = {}
+    with FakeDiscord(connect_latency, request_latency) as server:
+        url = f"{server.base_url}/channels/1/messages/2"
+        headers = {"Authorization": "Bot fake", "Content-Type": "application/json"}
+
+        # before: what every helper in utils/discord.py used to do
+        before = server.connections
+        samples = _time_calls(lambda: requests.get(url, headers=headers), calls)
+        results["bare_requests"] = _summarize(samples, server.connections - before)
+
+        # after: one module-level session with a connection pool
+        session = http.new_session(headers)
+        before = server.connections
+        samples = _time_calls(
+            lambda: session.get(url, timeout=http.DEFAULT_TIMEOUT), calls
+        )
+        results["pooled_session"] = _summarize(samples, server.connections - before)
+
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--calls", type=int, default=200)
+    arg_parser.add_argument("--connect-latency", type=float, default=0.03)
+    arg_parser.add_argument("--request-latency", type=float, default=0.0)
+    args = arg_parser.parse_args()
+
+    print(
+        json.dumps(
+            run(args.calls, args.connect_latency, args.request_latency), indent=2
+        )
+    )
@@ -0,0 +1,175 @@
+"""Cold and warm latency of the dispatcher lambda (main.lambda_handler).
+
+Events are signed with a throwaway key, the public key is seeded into
+utils/ssm.py's cache and the processor invoke is replaced with a stub that
+sleeps --invoke-latency, so no AWS access is needed:
+
+    python scripts/bench_dispatcher.py --cold-runs 10 --warm-calls 500
+
+cold = fresh interpreter: `import main` plus the first request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nacl.signing import SigningKey
+
+# runs inside the measured process; everything before `import main` is setup.
+# the stub client is only seeded after the import so boto3 (via
+# utils/aws_lambda.py) counts toward the cold import like it does in lambda
+_PREAMBLE = """
+import json, sys, time
+setup = json.loads(sys.stdin.read())
+
+from utils import ssm
+ssm._PARAMETERS[ssm.DISCORD_PUBLIC_KEY] = {"value": setup["public_key"], "fetched_at": time.time()}
+
+class _StubLambda:
+    def invoke(self, **kwargs):
+        time.sleep(setup["invoke_latency"])
+
+preloaded = set(sys.modules)
+"""
+
+_COLD = (
+    _PREAMBLE
+    + """
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.aws_lambda._CLIENTS["lambda"] = _StubLambda()
+main.lambda_handler(setup["events"][0], None)
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_call_ms": (done - imported) * 1000,
+    "modules_imported": sorted(set(sys.modules) - preloaded),
+}))
+"""
+)
+
+_WARM = (
+    _PREAMBLE
+    + """
+import main
+main.aws_lambda._CLIENTS["lambda"] = _StubLambda()
+samples = []
+for i in range(setup["calls"]):
+    event = setup["events"][i % len(setup["events"])]
+    start = time.perf_counter()
+    main.lambda_handler(event, None)
+    samples.append((time.perf_counter() - start) * 1000)
+print(json.dumps(samples))
+"""
+)
+
+
+def _signed_event(signing_key, body):
+    raw_body = json.dumps(body)
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign((timestamp + raw_body).encode()).signature.hex()
+    return {
+        "rawBody": raw_body,
+        "body-json": body,
+        "params": {
+            "header": {
+                "x-signature-ed25519": signature,
+                "x-signature-timestamp": timestamp,
+            }
+        },
+    }
+
+
+def _interaction(interaction_type, data):
+    return {
+        "type": interaction_type,
+        "id": "1",
+        "token": "t",
+        "application_id": "2",
+        "channel_id": "3",
+        "guild_id": "4",
+        "member": {"user": {"id": "5"}},
+        "data": data,
+    }
+
+
+def _events(signing_key, command):
+    command = _interaction(2, {"name": command})
+    click = _interaction(3, {"custom_id": "COMING"})
+    return [_signed_event(signing_key, command), _signed_event(signing_key, click)]
+
+
+def _run(snippet, setup):
+    result = subprocess.run(
+        [sys.executable, "-c", snippet],
+        input=json.dumps(setup),
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+    }
+
+
+def run(cold_runs, warm_calls, invoke_latency, command):
+    signing_key = SigningKey.generate()
+    setup = {
+        "public_key": signing_key.verify_key.encode().hex(),
+        "invoke_latency": invoke_latency,
+        "events": _events(signing_key, command),
+        "calls": warm_calls,
+    }
+
+    cold = [_run(_COLD, setup) for _ in range(cold_runs)]
+    warm = _run(_WARM, setup)
+
+    return {
+        "cold": {
+            "import": _percentiles([run["import_ms"] for run in cold]),
+            "first_call": _percentiles([run["first_call_ms"] for run in cold]),
+            "total": _percentiles(
+                [run["import_ms"] + run["first_call_ms"] for run in cold]
+            ),
+            "modules_imported": cold[0]["modules_imported"],
+        },
+        "warm": _percentiles(warm),
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--cold-runs", type=int, default=10)
+    arg_parser.add_argument("--warm-calls", type=int, default=500)
+    arg_parser.add_argument("--invoke-latency", type=float, default=0.0)
+    # inline-capable commands (commands/inline.py) are answered without the invoke
+    arg_parser.add_argument("--command", default="price")
+    args = arg_parser.parse_args()
+
+    print(
+        json.dumps(
+            run(args.cold_runs, args.warm_calls, args.invoke_latency, args.command),
+            indent=2,
+        )
+    )
@@ -0,0 +1,101 @@
+"""Scanned vs returned items for the scheduler's calendar reads.
+
+Seeds an in-memory lost_ark_schedule (scripts/fake_aws.py) with --events events,
+--signups signups each and --calendars calendar posts, then reads the event
+infos and calendar posts the old way (scan + contains(pk, ...)) and through
+record_type-index, and prints items evaluated vs returned, requests and time:
+
+    python scripts/bench_schedule_reads.py --events 500 --signups 8 --latency 0.01
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+
+from scripts.fake_aws import FakeDynamoDB
+
+from handlers import scheduler
+from utils import dynamodb
+
+# roughly how many of these rows fit in a 1 MB dynamodb page
+PAGE_SIZE = 2000
+
+
+def _rows(events, signups, calendars):
+    rows = []
+    for event in range(events):
+        event_id = f"5{event:017d}"
+        rows.append(
+            {
+                "pk": scheduler.EVENT_INFO_PKEY.format(event_id),
+                scheduler.RECORD_TYPE_COLUMN: scheduler.EVENT_INFO_RECORD,
+                scheduler.EVENT_ID_COLUMN: event_id,
+                scheduler.EVENT_TYPE_COLUMN: "Valtan",
+                scheduler.TIME_COLUMN: "2099-01-01T20:00:00",
+            }
+        )
+        for signup in range(signups):
+            user_id = f"3{signup:017d}"
+            rows.append(
+                {
+                    "pk": scheduler.COMMITMENT_PKEY.format(event_id, user_id),
+                    scheduler.EVENT_ID_COLUMN: event_id,
+                    scheduler.USER_COLUMN: user_id,
+                }
+            )
+    for calendar in range(calendars):
+        rows.append(
+            {
+                "pk": scheduler.CALENDAR_PKEY.format(f"9{calendar:017d}"),
+                scheduler.RECORD_TYPE_COLUMN: scheduler.CALENDAR_RECORD,
+            }
+        )
+    return rows
+
+
+def _measure(fake, read):
+    fake.calls.clear()
+    fake.items.clear()
+    start = time.perf_counter()
+    rows = read()
+    return {
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+        "requests": sum(fake.calls.values()),
+        "scanned": fake.items["scanned"],
+        "returned": fake.items["returned"],
+        "rows": len(rows),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--events", type=int, default=200)
+    arg_parser.add_argument("--signups", type=int, default=8)
+    arg_parser.add_argument("--calendars", type=int, default=3)
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="per request")
+    args = arg_parser.parse_args()
+
+    rows = _rows(args.events, args.signups, args.calendars)
+    fake = FakeDynamoDB({scheduler.SCHEDULE_TABLE: rows}, latency=args.latency)
+    dynamodb.dynamodb_client = fake
+    # page like dynamodb would once the table is past 1 MB
+    pages = dynamodb._pages
+    dynamodb._pages = lambda call, kwargs, page_size=None: pages(call, kwargs, page_size or PAGE_SIZE)
+
+    report = {"config": vars(args), "rows_in_table": len(rows)}
+    for mode, ready in (("scan", False), ("index", True)):
+        scheduler._record_types_ready = ready
+        report[mode] = {
+            "event_infos": _measure(fake, scheduler._get_event_infos),
+            "calendar_posts": _measure(fake, scheduler._get_calendar_posts),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
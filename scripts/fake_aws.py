@@ -0,0 +1,411 @@
+import copy
+import re
+import threading
+import time
+
+from collections import Counter
+
+# in-memory stand-ins for the boto3 objects the processor uses (the dynamodb
+# resource and the eventbridge scheduler client), for benchmarks. Only the
+# expression syntax this repo actually writes is understood. Every call sleeps
+# `latency` seconds and is counted in `calls`.
+
+PKEY_NAME = "pk"
+
+
+def _conditional_check_failed(operation):
+    from botocore.exceptions import ClientError
+
+    return ClientError(
+        {
+            "Error": {
+                "Code": "ConditionalCheckFailedException",
+                "Message": "The conditional request failed",
+            }
+        },
+        operation,
+    )
+
+
+def _split_top_level(expression, separator=","):
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == separator and depth == 0:
+            parts.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+class _Expression:
+    def __init__(self, names=None, values=None):
+        self.names = names or {}
+        self.values = values or {}
+
+    def name(self, token):
+        token = token.strip()
+        return self.names.get(token, token)
+
+    def operand(self, item, token):
+        token = token.strip()
+        if token.startswith(":"):
+            return self.values[token]
+        match = re.fullmatch(r"if_not_exists\s*\((.+),(.+)\)", token)
+        if match:
+            path = self.name(match.group(1))
+            return item[path] if path in item else self.operand(item, match.group(2))
+        return item.get(self.name(token))
+
+    def value(self, item, expression):
+        # operand [+|- operand]
+        match = re.fullmatch(r"(.+?)\s*([+-])\s*(:\w+)", expression.strip())
+        if match:
+            left = self.operand(item, match.group(1))
+            right = self.operand(item, match.group(3))
+            return left + right if match.group(2) == "+" else left - right
+        return self.operand(item, expression)
+
+    def matches(self, item, condition):
+        if not condition:
+            return True
+
+        clauses = re.split(r"\s+and\s+", condition.strip(), flags=re.IGNORECASE)
+        if len(clauses) > 1:
+            return all(self.matches(item, clause) for clause in clauses)
+
+        clause = clauses[0].strip()
+        match = re.fullmatch(r"(attribute_exists|attribute_not_exists)\s*\((.+)\)", clause)
+        if match:
+            exists = self.name(match.group(2)) in item
+            return exists if match.group(1) == "attribute_exists" else not exists
+
+        match = re.fullmatch(r"contains\s*\((.+),(.+)\)", clause)
+        if match:
+            haystack = item.get(self.name(match.group(1)))
+            return haystack is not None and self.operand(item, match.group(2)) in haystack
+
+        match = re.fullmatch(r"(.+?)\s*(<>|<=|>=|=|<|>)\s*(.+)", clause)
+        if match:
+            left = self.operand(item, match.group(1))
+            right = self.operand(item, match.group(3))
+            if left is None:
+                return False
+            return {
+                "=": left == right,
+                "<>": left != right,
+                "<": left < right,
+                "<=": left <= right,
+                ">": left > right,
+                ">=": left >= right,
+            }[match.group(2)]
+
+        raise NotImplementedError(f"fake dynamodb can't evaluate `{clause}`")
+
+    def update(self, item, expression):
+        """Applies a SET/ADD/REMOVE update expression; returns the touched paths."""
+        # right-hand sides see the item as it was before the update, like dynamodb
+        before = copy.deepcopy(item)
+        touched = []
+        clauses = re.split(r"\b(SET|ADD|REMOVE)\b", expression, flags=re.IGNORECASE)
+        for keyword, body in zip(clauses[1::2], clauses[2::2]):
+            keyword = keyword.upper()
+            for action in _split_top_level(body):
+                if keyword == "SET":
+                    path, value = action.split("=", 1)
+                    path = self.name(path)
+                    item[path] = self.value(before, value)
+                elif keyword == "ADD":
+                    path, value = action.split()
+                    path = self.name(path)
+                    item[path] = item.get(path, 0) + self.operand(before, value)
+                else:
+                    path = self.name(action)
+                    item.pop(path, None)
+                touched.append(path)
+        return touched
+
+
+def _key_condition(condition):
+    """boto3 Key(...).eq(...) (optionally &-ed together) -> {attribute: value}."""
+    expression = condition.get_expression()
+    if expression["operator"] == "AND":
+        return {
+            **_key_condition(expression["values"][0]),
+            **_key_condition(expression["values"][1]),
+        }
+    if expression["operator"] != "=":
+        raise NotImplementedError(f"fake dynamodb only does `=` key conditions")
+    key, value = expression["values"]
+    return {key.name: value}
+
+
+def _project(item, projection, names):
+    if not projection:
+        return item
+    expression = _Expression(names)
+    paths = [expression.name(path) for path in _split_top_level(projection)]
+    return {path: item[path] for path in paths if path in item}
+
+
+class FakeTable:
+    def __init__(self, resource, name):
+        self.resource = resource
+        self.name = name
+        self.table_name = name
+
+    @property
+    def _items(self):
+        return self.resource.tables.setdefault(self.name, {})
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self.resource._call("get_item")
+        with self.resource.lock:
+            item = self._items.get(Key[PKEY_NAME])
+            if item is None:
+                return {}
+            return {"Item": copy.deepcopy(_project(item, ProjectionExpression, ExpressionAttributeNames))}
+
+    def put_item(
+        self,
+        Item,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        **kwargs,
+    ):
+        self.resource._call("put_item")
+        expression = _Expression(ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.resource.lock:
+            existing = self._items.get(Item[PKEY_NAME], {})
+            if not expression.matches(existing, ConditionExpression):
+                raise _conditional_check_failed("PutItem")
+            self._items[Item[PKEY_NAME]] = copy.deepcopy(Item)
+        return {}
+
+    def update_item(
+        self,
+        Key,
+        UpdateExpression="",
+        ExpressionAttributeValues=None,
+        ExpressionAttributeNames=None,
+        ConditionExpression=None,
+        ReturnValues="NONE",
+        **kwargs,
+    ):
+        self.resource._call("update_item")
+        expression = _Expression(ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.resource.lock:
+            item = copy.deepcopy(self._items.get(Key[PKEY_NAME], {}))
+            if not expression.matches(item, ConditionExpression):
+                raise _conditional_check_failed("UpdateItem")
+            item.update(Key)
+            touched = expression.update(item, UpdateExpression)
+            self._items[Key[PKEY_NAME]] = item
+
+            if ReturnValues == "ALL_NEW":
+                return {"Attributes": copy.deepcopy(item)}
+            if ReturnValues == "UPDATED_NEW":
+                return {"Attributes": {path: copy.deepcopy(item[path]) for path in touched if path in item}}
+            return {}
+
+    def delete_item(
+        self,
+        Key,
+        ConditionExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        **kwargs,
+    ):
+        self.resource._call("delete_item")
+        expression = _Expression(ExpressionAttributeNames, ExpressionAttributeValues)
+        with self.resource.lock:
+            existing = self._items.get(Key[PKEY_NAME], {})
+            if not expression.matches(existing, ConditionExpression):
+                raise _conditional_check_failed("DeleteItem")
+            self._items.pop(Key[PKEY_NAME], None)
+        return {}
+
+    def _read(self, items, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, ProjectionExpression, Limit, ExclusiveStartKey):
+        # pages end after Limit evaluated items (before filtering), like dynamodb
+        if ExclusiveStartKey:
+            keys = [item[PKEY_NAME] for item in items]
+            items = items[keys.index(ExclusiveStartKey[PKEY_NAME]) + 1 :]
+        page = items[:Limit] if Limit else items
+
+        expression = _Expression(ExpressionAttributeNames, ExpressionAttributeValues)
+        matched = [
+            copy.deepcopy(_project(item, ProjectionExpression, ExpressionAttributeNames))
+            for item in page
+            if expression.matches(item, FilterExpression)
+        ]
+        self.resource._items_read(len(page), len(matched))
+        response = {"Items": matched, "Count": len(matched), "ScannedCount": len(page)}
+        if len(page) < len(items):
+            response["LastEvaluatedKey"] = {PKEY_NAME: page[-1][PKEY_NAME]}
+        return response
+
+    def query(
+        self,
+        KeyConditionExpression,
+        IndexName=None,
+        FilterExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ProjectionExpression=None,
+        Limit=None,
+        ExclusiveStartKey=None,
+        **kwargs,
+    ):
+        self.resource._call("query")
+        key = _key_condition(KeyConditionExpression)
+        with self.resource.lock:
+            items = [
+                item
+                for item in self._items.values()
+                if all(item.get(name) == value for name, value in key.items())
+            ]
+            return self._read(items, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, ProjectionExpression, Limit, ExclusiveStartKey)
+
+    def scan(
+        self,
+        FilterExpression=None,
+        ExpressionAttributeNames=None,
+        ExpressionAttributeValues=None,
+        ProjectionExpression=None,
+        Segment=0,
+        TotalSegments=1,
+        Limit=None,
+        ExclusiveStartKey=None,
+        **kwargs,
+    ):
+        self.resource._call("scan")
+        with self.resource.lock:
+            items = list(self._items.values())[Segment::TotalSegments]
+            return self._read(items, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues, ProjectionExpression, Limit, ExclusiveStartKey)
+
+
+class FakeDynamoDB:
+    """Stands in for boto3.resource("dynamodb"); tables are {name: [items]}."""
+
+    def __init__(self, tables=None, latency=0.0, batch_capacity=None):
+        self.latency = latency
+        # batch gets handle at most this many keys each and hand the
+        # rest back as unprocessed, like a throttled table
+        self.batch_capacity = batch_capacity
+        self.calls = Counter()
+        # items evaluated vs returned by query/scan, summed
+        self.items = Counter()
+        self.lock = threading.RLock()
+        self.load(tables or {})
+
+    def load(self, tables):
+        with self.lock:
+            self.tables = {
+                name: {item[PKEY_NAME]: copy.deepcopy(item) for item in items}
+                for name, items in tables.items()
+            }
+
+    def _call(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _items_read(self, scanned, returned):
+        with self.lock:
+            self.items["scanned"] += scanned
+            self.items["returned"] += returned
+
+    def Table(self, name):
+        return FakeTable(self, name)
+
+    def _split_batch(self, requests):
+        if self.batch_capacity is None:
+            return requests, []
+        return requests[: self.batch_capacity], requests[self.batch_capacity :]
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        self._call("batch_get_item")
+        responses, unprocessed = {}, {}
+        with self.lock:
+            for name, request in RequestItems.items():
+                keys, rest = self._split_batch(request["Keys"])
+                items = self.tables.setdefault(name, {})
+                responses[name] = [
+                    copy.deepcopy(
+                        _project(
+                            items[key[PKEY_NAME]],
+                            request.get("ProjectionExpression"),
+                            request.get("ExpressionAttributeNames"),
+                        )
+                    )
+                    for key in keys
+                    if key[PKEY_NAME] in items
+                ]
+                if rest:
+                    unprocessed[name] = {**request, "Keys": rest}
+        return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+
+class FakeScheduler:
+    """Stands in for boto3.client("scheduler")."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.schedules = {}
+        self.lock = threading.Lock()
+
+    def _call(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def create_schedule(self, Name, **kwargs):
+        self._call("create_schedule")
+        self.schedules[Name] = kwargs
+        return {"ScheduleArn": f"arn:fake:scheduler:{Name}"}
+
+    def update_schedule(self, Name, **kwargs):
+        self._call("update_schedule")
+        self.schedules[Name] = kwargs
+        return {"ScheduleArn": f"arn:fake:scheduler:{Name}"}
+
+    def delete_schedule(self, Name, **kwargs):
+        self._call("delete_schedule")
+        self.schedules.pop(Name, None)
+        return {}
+
+
+class FakeEvents:
+    """Stands in for boto3.client("events") (the maintenance watch timer rule)."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.rules = {}
+        self.lock = threading.Lock()
+
+    def _call(self, operation):
+        with self.lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def enable_rule(self, Name, **kwargs):
+        self._call("enable_rule")
+        self.rules[Name] = "ENABLED"
+        return {}
+
+    def disable_rule(self, Name, **kwargs):
+        self._call("disable_rule")
+        self.rules[Name] = "DISABLED"
+        return {}
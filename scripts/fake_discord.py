@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# local stand-in for the discord REST api, for benchmarks. every request gets a
+# small json body back; latency can be added per request and per new connection
+# (the latter stands in for the TCP+TLS handshake a real discord call pays)
+
+
+class FakeDiscordHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes; without this, delayed ACKs
+    # add ~40ms to every keep-alive response, which real servers don't have
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+        if self.server.connect_latency:
+            time.sleep(self.server.connect_latency)
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+
+        self.server.requests += 1
+        if self.server.request_latency:
+            time.sleep(self.server.request_latency)
+
+        status, headers, response = self.server.route(self.command, self.path, body)
+        # bytes go out as they are (pages, images); anything else as json
+        headers = dict(headers)
+        if isinstance(response, bytes):
+            payload = response
+            content_type = headers.pop("Content-Type", "application/octet-stream")
+        else:
+            payload = json.dumps(response).encode()
+            content_type = "application/json"
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDiscord(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, connect_latency=0.0, request_latency=0.0, port=0):
+        super().__init__(("127.0.0.1", port), FakeDiscordHandler)
+        self.connect_latency = connect_latency
+        self.request_latency = request_latency
+        self.connections = 0
+        self.requests = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v9"
+
+    def route(self, method, path, body=None):
+        # override for canned responses; returns (status, headers, body), where
+        # body is json-able or raw bytes
+        return 200, {}, {"id": "0", "method": method, "path": path}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,70 @@
+"""Cold-start import cost of command_handler and of each handler module.
+
+Each handler is imported in a fresh interpreter on top of command_handler, so the
+number is what the first command routed to it pays on a cold processor:
+
+    python scripts/import_report.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HANDLERS_DIR = os.path.join(ROOT, "handlers")
+
+_MEASURE = """
+import json, time
+start = time.perf_counter()
+import command_handler
+base = time.perf_counter()
+from utils import registry
+try:
+    registry.load_module({module!r})
+    error = None
+except Exception as e:
+    error = repr(e)
+end = time.perf_counter()
+print(json.dumps({{"base_ms": (base - start) * 1000, "handler_ms": (end - base) * 1000, "error": error}}))
+"""
+
+
+def _handler_modules():
+    return sorted(
+        f"handlers.{filename[:-3]}"
+        for filename in os.listdir(HANDLERS_DIR)
+        if filename.endswith(".py") and filename != "__init__.py"
+    )
+
+
+def _measure(module_name):
+    result = subprocess.run(
+        [sys.executable, "-c", _MEASURE.format(module=module_name)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run():
+    report = {}
+    for module_name in _handler_modules():
+        measured = _measure(module_name)
+        report[module_name] = {
+            "import_ms": round(measured.get("handler_ms", 0), 1),
+            "error": measured.get("error"),
+        }
+        if "base_ms" in measured:
+            report["command_handler"] = {
+                "import_ms": round(measured["base_ms"], 1),
+                "error": None,
+            }
+
+    return dict(sorted(report.items(), key=lambda item: item[1]["import_ms"], reverse=True))
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), indent=2))
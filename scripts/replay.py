@@ -0,0 +1,391 @@
+"""Replays recorded interactions through command_handler.lambda_handler.
+
+Discord, the market api, the server status page, dynamodb, eventbridge (rules and
+the scheduler) are replaced by local stand-ins (scripts/fake_discord.py,
+scripts/fake_aws.py) seeded from the fixture file, each with configurable latency.
+Fixtures are either an interaction `body` or a raw timer `event`; "{backends}" in
+them is replaced with the local server's url (e.g. for image urls). Prints per-command wall time
+percentiles and outbound call counts as json, so runs can be diffed. Messages
+discord would reject (e.g. empty or non-string embed field values) are answered
+with a 400 and listed under the interaction's errors:
+
+    python scripts/replay.py --runs 20 --discord-latency 0.05 --dynamodb-latency 0.01 > before.json
+
+State is reset before every run, so each run sees the fixture's state: the fakes
+are reloaded and the process caches of their data (dynamodb rows, discord
+members, roles and channels) are emptied. Everything else (ssm, boto3 clients,
+imported handlers) stays warm like it would on a warm lambda.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import json
+import os
+import re
+import statistics
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+
+from scripts.fake_aws import FakeDynamoDB, FakeEvents, FakeScheduler
+from scripts.fake_discord import FakeDiscord
+
+DEFAULT_FIXTURES = os.path.join(ROOT, "scripts", "fixtures", "replay.json")
+
+_MEMBER = re.compile(r"^/guilds/(\w+)/members/(\w+)$")
+_MEMBER_ROLE = re.compile(r"^/guilds/(\w+)/members/(\w+)/roles/(\w+)$")
+_CHANNEL = re.compile(r"^/channels/(\w+)$")
+_MARKET = re.compile(r"^/market/export-market-live/")
+
+# just enough of playlostark.com's server status page for handlers/server_status.py
+STATUS_PAGE = b"""<html><body><div class="ags-ServerStatus-content-responses">
+<div class="ags-ServerStatus-content-responses-response">
+<div class="ags-ServerStatus-content-responses-response-server">
+<div class="ags-ServerStatus-content-responses-response-server-status ags-ServerStatus-content-responses-response-server-status--good"></div>
+<div class="ags-ServerStatus-content-responses-response-server-name">Bergstrom</div>
+</div></div></div></body></html>"""
+
+
+def _png(width=2, height=2):
+    # a tiny solid png, for the nitro_react image download
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+IMAGE = _png()
+
+
+class FakeBackends(FakeDiscord):
+    """FakeDiscord that also serves the market api, backed by fixture state."""
+
+    def __init__(self, state, connect_latency=0.0, request_latency=0.0, market_latency=0.0):
+        super().__init__(connect_latency=connect_latency, request_latency=request_latency)
+        self.seed = state
+        self.market_latency = market_latency
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def root_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def market_url(self):
+        return f"{self.root_url}/market"
+
+    def reset(self):
+        with self.lock:
+            self.state = copy.deepcopy(self.seed)
+            self.created = 0
+            self.rejected = []
+
+    def _new_id(self):
+        self.created += 1
+        return f"9{self.created:05d}"
+
+    def route(self, method, path, body=None):
+        path, _, query = path.partition("?")
+        if _MARKET.match(path):
+            with self.lock:
+                self.calls[f"market {method}"] += 1
+            if self.market_latency:
+                time.sleep(self.market_latency)
+            return 200, {}, self._market(query)
+        if path == "/server-status":
+            with self.lock:
+                self.calls["status page GET"] += 1
+            return 200, {"Content-Type": "text/html"}, STATUS_PAGE
+        if path.startswith("/images/"):
+            with self.lock:
+                self.calls["image GET"] += 1
+            return 200, {"Content-Type": "image/png"}, IMAGE
+
+        path = path[len("/api/v9") :]
+        with self.lock:
+            self.calls[f"discord {method}"] += 1
+            error = _invalid_message(body)
+            if error:
+                # the bot doesn't check edit/followup responses, so make these show up
+                self.rejected.append(f"discord {method} rejected: {error}")
+                return 400, {}, {"code": 50035, "message": f"Invalid Form Body: {error}"}
+            return self._discord(method, path)
+
+    def _market(self, query):
+        ids = re.search(r"items=([^&]*)", query)
+        item_ids = ids.group(1).replace("%2C", ",").split(",") if ids else []
+        return [
+            {
+                "id": item_id,
+                "name": item_id.replace("-", " ").title(),
+                "image": "",
+                "amount": 1,
+                "lowPrice": 10,
+                "cheapestRemaining": 1000,
+                "shortHistoric": {"2022-06-06": 10, "2022-06-07": 11},
+            }
+            for item_id in item_ids
+        ]
+
+    def _discord(self, method, path):
+        discord_state = self.state["discord"]
+        members = discord_state["members"]
+
+        match = _MEMBER_ROLE.match(path)
+        if match:
+            roles = members.setdefault(match.group(2), {"roles": []})["roles"]
+            if method == "PUT" and match.group(3) not in roles:
+                roles.append(match.group(3))
+            elif method == "DELETE" and match.group(3) in roles:
+                roles.remove(match.group(3))
+            return 200, {}, {}
+
+        match = _MEMBER.match(path)
+        if match and method == "GET":
+            member = members.get(match.group(2), {"roles": []})
+            return 200, {}, {
+                "user": {"id": match.group(2), "username": f"user{match.group(2)}"},
+                "nick": member.get("nick"),
+                "roles": member["roles"],
+            }
+
+        if re.match(r"^/guilds/\w+/roles$", path):
+            return 200, {}, discord_state["roles"]
+        if re.match(r"^/guilds/\w+/channels$", path):
+            return 200, {}, [
+                {"id": channel_id, **channel}
+                for channel_id, channel in discord_state["channels"].items()
+            ]
+
+        match = _CHANNEL.match(path)
+        if match and method == "GET":
+            channel = discord_state["channels"].get(match.group(1), {"name": "general", "type": 0})
+            return 200, {}, {"id": match.group(1), **channel}
+
+        if path.endswith("/messages/@original") and method == "GET":
+            return 200, {}, {"id": self._new_id()}
+        if method == "POST":
+            # messages, threads, webhooks, scheduled events
+            return 200, {}, {"id": self._new_id()}
+        return 200, {}, {}
+
+
+def _invalid_message(body):
+    # the embed checks discord does that handlers have gotten wrong before
+    for embed in (body or {}).get("embeds") or []:
+        for field in embed.get("fields") or []:
+            if not isinstance(field.get("value"), str) or not field["value"]:
+                return f"embed field value {field.get('value')!r}"
+    return None
+
+
+class Replay:
+    def __init__(self, fixtures, args):
+        self.fixtures = fixtures
+        self.args = args
+        self.backends = FakeBackends(
+            fixtures["state"],
+            connect_latency=args.connect_latency,
+            request_latency=args.discord_latency,
+            market_latency=args.market_latency,
+        )
+        self.dynamodb = FakeDynamoDB(latency=args.dynamodb_latency)
+        self.scheduler = FakeScheduler(latency=args.scheduler_latency)
+        self.events = FakeEvents(latency=args.scheduler_latency)
+
+    def install(self):
+        from utils import ssm
+
+        now = time.time()
+        for name in ssm.DISCORD_SECRETS:
+            ssm._PARAMETERS[name] = {"value": "fake", "fetched_at": now}
+
+        # the calendar refresh timer is for the server the lambda is deployed for
+        os.environ.setdefault("SERVER_ID", self.fixtures["state"]["server_id"])
+
+        import command_handler
+        from constants import market_data
+        from utils import aws_lambda, coalesce, discord, dynamodb, eventbridge, metrics
+
+        discord.BASE_URL = self.backends.base_url
+        market_data.MARKET_API = self.backends.market_url
+        try:
+            from handlers import server_status
+
+            server_status.STATUS_URL = f"{self.backends.root_url}/server-status"
+        except ImportError as e:
+            # (bs4 missing) the status commands will show this as their error
+            print(f"Not faking the server status page: {e!r}", file=sys.stderr)
+        aws_lambda._CLIENTS["events"] = metrics.instrument(self.events, "events", "events")
+        dynamodb.dynamodb_client = self.dynamodb
+        dynamodb.new_resource = lambda: self.dynamodb
+        eventbridge.eventbridge_client = metrics.instrument(
+            self.scheduler, "scheduler", "scheduler"
+        )
+        coalesce.COALESCE_WINDOW = self.args.coalesce_window
+
+        self.command_handler = command_handler
+
+    def _reset(self):
+        from utils import discord, dynamodb
+
+        self.backends.reset()
+        self.dynamodb.load(self.fixtures["state"]["dynamodb"])
+        # otherwise a run reads rows/members an earlier run left behind
+        dynamodb._ITEMS.clear()
+        discord._MEMBER_CACHE.clear()
+        discord._ROLES_CACHE.clear()
+        discord.get_channel_by_id.cache_clear()
+
+    def _calls(self):
+        return Counter(
+            {
+                **self.backends.calls,
+                **{f"dynamodb {op}": n for op, n in self.dynamodb.calls.items()},
+                **{f"scheduler {op}": n for op, n in self.scheduler.calls.items()},
+                **{f"events {op}": n for op, n in self.events.calls.items()},
+            }
+        )
+
+    def _event(self, interaction, run):
+        recorded = json.dumps(interaction.get("event") or {"body-json": interaction["body"]})
+        event = json.loads(recorded.replace("{backends}", self.backends.root_url))
+        if "body-json" in event:
+            # fresh interaction id per run, like discord would send
+            body = event["body-json"]
+            body["id"] = f"{body['id']}{run}"
+        return event
+
+    def run_once(self, interaction, run):
+        event = self._event(interaction, run)
+
+        self._reset()
+        before = self._calls()
+        start = time.perf_counter()
+        error = None
+        logs = io.StringIO()
+        with contextlib.redirect_stdout(logs):
+            try:
+                self.command_handler.lambda_handler(event, None)
+            except Exception as e:
+                error = repr(e)
+        elapsed = (time.perf_counter() - start) * 1000
+        errors = ([error] if error else []) + self.backends.rejected
+        return elapsed, self._calls() - before, _backend_ms(logs.getvalue()), errors
+
+    def run(self, names=None, runs=1):
+        report = {}
+        for interaction in self.fixtures["interactions"]:
+            name = interaction["name"]
+            if names and name not in names:
+                continue
+
+            samples, calls, backend_ms, errors = [], Counter(), Counter(), []
+            for run in range(runs):
+                elapsed, run_calls, run_backend_ms, run_errors = self.run_once(interaction, run)
+                samples.append(elapsed)
+                calls.update(run_calls)
+                backend_ms.update(run_backend_ms)
+                errors.extend(run_errors)
+
+            report[name] = {
+                **_percentiles(samples),
+                "calls_per_run": {
+                    call: round(n / runs, 2) for call, n in sorted(calls.items())
+                },
+                "total_calls_per_run": round(sum(calls.values()) / runs, 2),
+                "backend_ms_per_run": {
+                    backend: round(ms / runs, 2) for backend, ms in sorted(backend_ms.items())
+                },
+                "errors": sorted(set(errors)),
+            }
+        return report
+
+
+def _backend_ms(logs):
+    # time per backend, from the processor's own metrics line (utils/metrics.py)
+    for line in logs.splitlines():
+        if line.startswith('{"metric":"invocation"'):
+            return Counter(
+                {
+                    backend: stats["ms"]
+                    for backend, stats in json.loads(line)["backends"].items()
+                }
+            )
+    return Counter()
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 2)
+
+    return {
+        "runs": len(ordered),
+        "mean_ms": round(statistics.mean(ordered), 2),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    arg_parser.add_argument("--runs", type=int, default=10)
+    arg_parser.add_argument("--only", nargs="*", help="interaction names to replay")
+    arg_parser.add_argument("--discord-latency", type=float, default=0.0)
+    arg_parser.add_argument("--connect-latency", type=float, default=0.0)
+    arg_parser.add_argument("--dynamodb-latency", type=float, default=0.0)
+    arg_parser.add_argument("--scheduler-latency", type=float, default=0.0)
+    arg_parser.add_argument("--market-latency", type=float, default=0.0)
+    arg_parser.add_argument("--coalesce-window", type=float, default=0.0)
+    arg_parser.add_argument("--output", help="write the report here instead of stdout")
+    args = arg_parser.parse_args()
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+
+    replay = Replay(fixtures, args)
+    with replay.backends:
+        replay.install()
+        config = {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "only")
+        }
+        config["fixtures"] = os.path.relpath(args.fixtures, ROOT)
+        report = {
+            "config": config,
+            "interactions": replay.run(args.only, args.runs),
+        }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,27 @@
 import boto3
 import json
 
-LAMBDA = boto3.client('lambda')
-EVENTS = boto3.client('events')
+from utils import metrics
 
 API_CALLER = "robotrader"
 
+# created on first use; the dispatcher only ever needs the lambda client
+_CLIENTS = {}
+
+
+def _client(service):
+    if service not in _CLIENTS:
+        _CLIENTS[service] = metrics.instrument(boto3.client(service), service, service)
+    return _CLIENTS[service]
+
 
 def invoke_processor(body):
-    response = LAMBDA.invoke(FunctionName=API_CALLER,
-                             InvocationType='Event',
-                             Payload=bytes(json.dumps(body), 'utf-8'))
+    response = _client('lambda').invoke(FunctionName=API_CALLER,
+                                        InvocationType='Event',
+                                        Payload=bytes(json.dumps(body), 'utf-8'))
 
 def enable_rule(name):
-    EVENTS.enable_rule(Name=name)
+    _client('events').enable_rule(Name=name)
 
 def disable_rule(name):
-    EVENTS.disable_rule(Name=name)
+    _client('events').disable_rule(Name=name)
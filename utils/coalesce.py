@@ -0,0 +1,71 @@
+import time
+
+from utils import dynamodb, memo
+
+# When lots of people click the same message at once, every processor invocation
+# used to re-render and PATCH it, and all but the last edit got overwritten right
+# away. Instead, each invocation takes a ticket for the message. If nobody else
+# took one within the last window, it renders and sends right away; otherwise it
+# waits out the window and only renders + sends if nobody took a newer ticket in
+# the meantime. The newest ticket is always taken after every older click's
+# write, so its render (computed after the window, from fresh state) covers all
+# of them.
+
+COALESCE_TABLE = "lost_ark_generic"
+RENDER_PKEY = "render:{}:{}"
+TICKET_COLUMN = "ticket"
+TAKEN_AT_COLUMN = "taken_at_ms"
+PREVIOUS_TAKEN_AT_COLUMN = "previous_taken_at_ms"
+# the table's ttl attribute (same as utils/idempotency.py's records)
+EXPIRES_COLUMN = "expires_at"
+
+COALESCE_WINDOW = 0.75  # seconds
+TTL = 24 * 60 * 60  # seconds
+
+
+def _take_ticket(pkey: str):
+    """(ticket, when the ticket before it was taken, 0 if never)."""
+    now = time.time()
+    row = dynamodb.update_counters(
+        COALESCE_TABLE,
+        pkey,
+        {TICKET_COLUMN: 1},
+        set_columns={TAKEN_AT_COLUMN: int(now * 1000), EXPIRES_COLUMN: int(now) + TTL},
+        copy_columns={PREVIOUS_TAKEN_AT_COLUMN: TAKEN_AT_COLUMN},
+    )
+    return int(row[TICKET_COLUMN]), int(row[PREVIOUS_TAKEN_AT_COLUMN]) / 1000
+
+
+def _latest_ticket(pkey: str) -> int:
+    # other invocations bump this, so never answer it from the memo
+    with memo.bypass():
+        rows = dynamodb.get_rows(COALESCE_TABLE, pkey)
+    return int(rows[0][TICKET_COLUMN]) if rows else 0
+
+
+def latest_render(channel_id: str, message_id: str, render, window=None):
+    """Last-writer-wins edit of (channel_id, message_id).
+
+    Call after this invocation's own write. Returns render() right away if no
+    other edit of the message was requested in the last `window` seconds
+    (COALESCE_WINDOW by default). Otherwise waits `window` seconds and returns
+    render() if this is still the newest edit request, else None (a newer
+    invocation will send the edit instead).
+    """
+    if window is None:
+        window = COALESCE_WINDOW
+    pkey = RENDER_PKEY.format(channel_id, message_id)
+    ticket, previous_taken_at = _take_ticket(pkey)
+
+    if time.time() - previous_taken_at < window:
+        # contended: let the burst settle, then only the newest click sends
+        time.sleep(window)
+        if _latest_ticket(pkey) > ticket:
+            return None
+
+    # anything read before the ticket may have been changed by the clicks we're
+    # covering for, possibly in other containers, so neither this invocation's
+    # memo nor the process-level row cache can answer for it
+    memo.clear()
+    with memo.fresh():
+        return render()
@@ -1,27 +1,25 @@
-import boto3
 import re
-import requests
+import threading
+import time
 
 from functools import lru_cache
-from nacl.signing import VerifyKey
-from nacl.exceptions import BadSignatureError
 
 from constants.interactions import InteractionsCallbackType
 from typing import Union
+from utils import cache, http, memo, metrics, packer, ratelimit, ssm
 
-PING_PONG = {"type": 1}
-
-MAX_RESPONSE_LENGTH = 2000
-MAX_EMBED_DESCRIPTION_LENGTH = 4096
-RESPONSE_TYPES = {
-    "PONG": 1,
-    "ACK_NO_SOURCE": 2,
-    "MESSAGE_NO_SOURCE": 3,
-    "MESSAGE_WITH_SOURCE": 4,
-    "ACK_WITH_SOURCE": 5,
-    "DEFERRED_UPDATE_MESSAGE": 6,
-    "MODAL": 9,
-}
+# verification and response formatting live in utils/dispatch.py so the dispatcher
+# lambda can use them without importing this module
+from utils.dispatch import (
+    PING_PONG,
+    RESPONSE_TYPES,
+    check_input,
+    format_response,
+    initial_response,
+)
+
+MAX_RESPONSE_LENGTH = packer.MAX_CONTENT_LENGTH
+MAX_EMBED_DESCRIPTION_LENGTH = packer.MAX_DESCRIPTION_LENGTH
 
 CHANNEL_TYPES = {
     "GUILD_VOICE": 2
@@ -29,15 +27,14 @@ CHANNEL_TYPES = {
 
 BASE_URL = "https://discord.com/api/v9"
 
-ssm = boto3.client("ssm", region_name="us-east-2")
+# shared across every call (and every warm invocation) so connections get reused
+SESSION = http.new_session({"Content-Type": "application/json"})
+TIMEOUT = http.DEFAULT_TIMEOUT
 
-PUBLIC_KEY = ssm.get_parameter(
-    Name="/discord/public_key/lost-ark-guild-bot", WithDecryption=True
-)["Parameter"]["Value"]
-BOT_TOKEN = ssm.get_parameter(
-    Name="/discord/bot_token/lost-ark-guild-bot", WithDecryption=True
-)["Parameter"]["Value"]
-HEADERS = {"Authorization": f"Bot {BOT_TOKEN}", "Content-Type": "application/json"}
+# requests wait out discord's rate limit buckets (and retry 429s) for up to this
+# many seconds before the 429 is handed back to the caller
+RATE_LIMIT_DEADLINE = 10
+RATE_LIMITER = ratelimit.RateLimiter()
 
 SIZE_ROLE_NAME_PATTERN = re.compile(r"Size (?P<size>\d+)")
 
@@ -48,33 +45,70 @@ _PERMISSIONS = {
     "SEND_MESSAGES": 0x0000000800,
 }
 
-# Verification related
+
+# Request related
+def _session():
+    # the token is resolved on first use, so importing this module is free
+    if "Authorization" not in SESSION.headers:
+        token = ssm.get_parameters(ssm.DISCORD_SECRETS)[ssm.DISCORD_BOT_TOKEN]
+        SESSION.headers["Authorization"] = f"Bot {token}"
+    return SESSION
 
 
-def _verify_signature(event):
-    raw_body = event.get("rawBody")
-    auth_sig = event["params"]["header"].get("x-signature-ed25519")
-    auth_ts = event["params"]["header"].get("x-signature-timestamp")
-    message = auth_ts.encode() + raw_body.encode()
+def _path(url):
+    return url.split("?", 1)[0]
 
-    try:
-        verify_key = VerifyKey(bytes.fromhex(PUBLIC_KEY))
-        verify_key.verify(message, bytes.fromhex(auth_sig))
-    except Exception as e:
-        raise Exception(f"[UNAUTHORIZED] Invalid request signature: {e}")
 
+def _overlaps(path, written_path):
+    # a write to /guilds/1/members/2/roles/3 makes GET /guilds/1/members/2 stale,
+    # and a write to /channels/1/messages/2 makes GET /channels/1/messages stale
+    return (
+        path == written_path
+        or path.startswith(written_path + "/")
+        or written_path.startswith(path + "/")
+    )
+
+
+def _request(method, url, **kwargs):
+    # successful GETs are memoized for the rest of the invocation (utils/memo.py);
+    # callers only ever .json() the response, which parses a fresh copy every time
+    if method == "GET":
+        return memo.read(
+            "discord",
+            _path(url),
+            memo.key(url, kwargs.get("params")),
+            lambda: _send(method, url, **kwargs),
+            copy_result=False,
+            keep=lambda response: response.ok,
+        )
+
+    response = _send(method, url, **kwargs)
+    written_path = _path(url)
+    memo.invalidate("discord", lambda path: _overlaps(path, written_path))
+    return response
 
-def _ping_pong(body):
-    if body.get("type") == 1:
-        return True
-    return False
 
+def _send(method, url, **kwargs):
+    kwargs.setdefault("timeout", TIMEOUT)
+    session = _session()
+    route = ratelimit.route_key(method, url)
+    deadline = time.monotonic() + RATE_LIMIT_DEADLINE
 
-def check_input(event):
-    _verify_signature(event)
-    body = event.get("body-json")
-    if _ping_pong(body):
-        return PING_PONG
+    while True:
+        # past the deadline we send anyway and let the caller see the 429
+        RATE_LIMITER.acquire(route, deadline)
+        with metrics.timed("discord", route[0]) as call:
+            response = session.request(method, url, **kwargs)
+            call["status"] = response.status_code
+            call["bytes"] = len(response.content)
+
+        retry_after = RATE_LIMITER.update(route, response)
+        if retry_after is None or time.monotonic() + retry_after > deadline:
+            return response
+
+        RATE_LIMITER.retries += 1
+        metrics.count("retries")
+        print(f"Rate limited on {route[0]}, retrying in {retry_after}s")
 
 
 def get_input(data, target):
@@ -92,12 +126,12 @@ def get_channel_by_id(channel_id):
     Params found at https://discord.com/developers/docs/resources/channel
     """
     url = f"{BASE_URL}/channels/{channel_id}"
-    return requests.get(url, headers=HEADERS).json()
+    return _request("GET", url).json()
 
 
 def get_server_channels(server_id): 
     url = f"{BASE_URL}/guilds/{server_id}/channels"
-    return requests.get(url, headers=HEADERS).json()
+    return _request("GET", url).json()
 
 
 def create_thread(
@@ -107,100 +141,167 @@ def create_thread(
         url = f"{BASE_URL}/channels/{channel_id}/threads"
     else:
         url = f"{BASE_URL}/channels/{channel_id}/messages/{message_id}/threads"
-    return requests.post(
+    return _request(
+        "POST",
         url,
         json={"name": thread_name, "auto_archive_duration": duration},
-        headers=HEADERS,
     ).json()
 
 
 def archive_thread(thread_id: str) -> dict:
     url = f"{BASE_URL}/channels/{thread_id}"
-    return requests.patch(url, json={"archived": True}, headers=HEADERS).json()
+    return _request("PATCH", url, json={"archived": True}).json()
 
 
 def get_thread_members(channel_id):
     url = f"{BASE_URL}/channels/{channel_id}/thread-members"
-    return requests.get(url, headers=HEADERS).json()
+    return _request("GET", url).json()
 
 
 def add_thread_member(thread_id, user_id):
     url = f"{BASE_URL}/channels/{thread_id}/thread-members/{user_id}"
-    return requests.put(url, headers=HEADERS).text
+    return _request("PUT", url).text
 
 
 def remove_thread_member(thread_id, user_id):
     url = f"{BASE_URL}/channels/{thread_id}/thread-members/{user_id}"
-    return requests.delete(url, headers=HEADERS).text
+    return _request("DELETE", url).text
 
 
 # Role-related
-_ROLES_CACHE = {}
+# per-guild role lists with id/name indexes. entries expire after ROLES_CACHE_TTL,
+# and a lookup that misses refetches early, since the role may have just been
+# created or renamed (at most once per ROLES_MIN_REFRESH_INTERVAL, so lookups for
+# roles that really don't exist don't refetch every time)
+ROLES_CACHE_TTL = 300
+ROLES_MIN_REFRESH_INTERVAL = 10
+_ROLES_CACHE = cache.TTLCache(maxsize=16, ttl=ROLES_CACHE_TTL)
+
+
+class _GuildRoles:
+    def __init__(self, roles):
+        self.roles = roles
+        self.fetched_at = time.monotonic()
+        self.by_id = {}
+        self.by_name = {}
+        for role in roles:
+            self.by_id.setdefault(role["id"], role)
+            self.by_name.setdefault(role["name"], role)
+
+
+def _get_guild_roles(server_id, force_refresh=False):
+    guild_roles = None if force_refresh else _ROLES_CACHE.get(server_id)
+    if guild_roles is None:
+        url = f"{BASE_URL}/guilds/{server_id}/roles"
+        guild_roles = _GuildRoles(_request("GET", url).json())
+        _ROLES_CACHE.set(server_id, guild_roles)
+    return guild_roles
+
+
+def _lookup_roles(server_id, keys, index_name):
+    guild_roles = _get_guild_roles(server_id)
+    index = getattr(guild_roles, index_name)
+    if any(key not in index for key in keys) and (
+        time.monotonic() - guild_roles.fetched_at > ROLES_MIN_REFRESH_INTERVAL
+    ):
+        guild_roles = _get_guild_roles(server_id, force_refresh=True)
+        index = getattr(guild_roles, index_name)
+    return {key: index.get(key) for key in keys}
 
 
 def _get_all_roles(server_id, force_refresh=False):
-    if server_id in _ROLES_CACHE and not force_refresh:
-        return _ROLES_CACHE[server_id]
-    url = f"{BASE_URL}/guilds/{server_id}/roles"
-    roles = requests.get(url, headers=HEADERS).json()
-    _ROLES_CACHE[server_id] = roles
-    return roles
+    return _get_guild_roles(server_id, force_refresh=force_refresh).roles
 
 
 def get_roles_by_ids(server_id, role_ids):
-    roles = _get_all_roles(server_id)
-    return [role for role in roles if role["id"] in role_ids]
+    roles = _lookup_roles(server_id, role_ids, "by_id")
+    return [role for role in roles.values() if role]
 
 
 def get_roles_by_names(server_id, role_names):
-    roles = _get_all_roles(server_id)
-    return [role for role in roles if role["name"] in role_names]
+    roles = _lookup_roles(server_id, role_names, "by_name")
+    return [role for role in roles.values() if role]
 
 
 def _get_role_ids_by_name(server_id, role_names):
-    results = {key: None for key in role_names}
-    for role in _get_all_roles(server_id):
-        if role["name"] in role_names:
-            results[role["name"]] = role["id"]
-        if None not in results.values():
-            return results
+    roles = _lookup_roles(server_id, role_names, "by_name")
+    return {name: role["id"] if role else None for name, role in roles.items()}
 
 
 def _get_role_names_by_id(server_id, role_ids):
-    results = {key: None for key in role_ids}
-    for role in _get_all_roles(server_id):
-        if role["id"] in role_ids:
-            results[role["id"]] = role["name"]
-        if None not in results.values():
-            return results
+    roles = _lookup_roles(server_id, role_ids, "by_id")
+    return {role_id: role["name"] if role else None for role_id, role in roles.items()}
+
+
+def roles_cache_stats():
+    return _ROLES_CACHE.stats()
 
 
 def remove_role(user_id, role_id, server_id):
     url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}/roles/{role_id}"
-    return requests.delete(url, headers=HEADERS)
+    response = _request("DELETE", url)
+    if response.ok:
+        _update_cached_member_roles(server_id, user_id, removed=role_id)
+    return response
 
 
 def add_role(user_id, role_id, server_id):
     url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}/roles/{role_id}"
-    return requests.put(url, headers=HEADERS)
+    response = _request("PUT", url)
+    if response.ok:
+        _update_cached_member_roles(server_id, user_id, added=role_id)
+    return response
+
+
+# Member-related
+# guild member objects, keyed by (server_id, user_id); kept correct after our own
+# role changes, so only changes made outside the bot can be up to TTL seconds old
+MEMBER_CACHE_TTL = 60
+_MEMBER_CACHE = cache.TTLCache(maxsize=1024, ttl=MEMBER_CACHE_TTL)
+# role changes can be fanned out across threads
+_MEMBER_LOCK = threading.Lock()
+
+
+def _get_member(server_id, user_id, force_refresh=False):
+    key = (server_id, user_id)
+    member = None if force_refresh else _MEMBER_CACHE.get(key)
+    if member is None:
+        url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}"
+        response = _request("GET", url)
+        member = response.json()
+        if response.ok:
+            _MEMBER_CACHE.set(key, member)
+    return member
+
+
+def _update_cached_member_roles(server_id, user_id, added=None, removed=None):
+    with _MEMBER_LOCK:
+        member = _MEMBER_CACHE.peek((server_id, user_id))
+        if member is None:
+            return
+        roles = [role for role in member["roles"] if role != removed]
+        if added and added not in roles:
+            roles.append(added)
+        member["roles"] = roles
+
+
+def member_cache_stats():
+    return _MEMBER_CACHE.stats()
 
 
 def get_user_role_ids(server_id, user_id):
-    url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}"
-    user = requests.get(url, headers=HEADERS).json()
-    return user["roles"]
+    return _get_member(server_id, user_id)["roles"]
 
 
 def get_user_role_names(server_id, user_id):
-    url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}"
-    user = requests.get(url, headers=HEADERS).json()
+    user = _get_member(server_id, user_id)
     return get_roles_by_ids(server_id, user["roles"])
 
 
 def get_all_users(server_id):
     # return all user_ids in a server
     url = f"{BASE_URL}/guilds/{server_id}/members?limit=1000"
-    response = requests.get(url, headers=HEADERS)
+    response = _request("GET", url)
     return response.json()
 
 
@@ -215,8 +316,7 @@ def change_role(server_id, user_id, old_role_name, new_role_name):
 
 
 def get_user_nickname_by_id(server_id, user_id):
-    url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}"
-    user = requests.get(url, headers=HEADERS).json()
+    user = _get_member(server_id, user_id)
     if user["nick"]:
         return user["nick"]
     else:
@@ -224,8 +324,7 @@ def get_user_nickname_by_id(server_id, user_id):
 
 
 def is_admin(server_id, user_id, admin_role_id):
-    url = f"{BASE_URL}/guilds/{server_id}/members/{user_id}"
-    user = requests.get(url, headers=HEADERS).json()
+    user = _get_member(server_id, user_id)
     return admin_role_id in user["roles"]
 
 
@@ -233,79 +332,57 @@ def is_admin(server_id, user_id, admin_role_id):
 def post_message_in_channel(channel_id, message, ephemeral=True):
     url = f"{BASE_URL}/channels/{channel_id}/messages"
     body = format_response(message, ephemeral)
-    r = requests.post(url, json=body, headers=HEADERS)
+    r = _request("POST", url, json=body)
 
 
 def delete_message(channel_id, message_id):
     url = f"{BASE_URL}/channels/{channel_id}/messages/{message_id}"
-    requests.delete(url, headers=HEADERS)
+    _request("DELETE", url)
 
 
 def get_messages(channel_id, limit, specified_message):
     # gets the last <limit> messages from the specified channel
     url = f"https://discord.com/api/v8/channels/{channel_id}/messages?limit={limit}"
-    return requests.get(url, headers=HEADERS).json()
+    return _request("GET", url).json()
 
 
 def get_message_by_id(channel_id, message_id):
     url = f"{BASE_URL}/channels/{channel_id}/messages/{message_id}"
 
-    return requests.get(url, headers=HEADERS).json()
+    return _request("GET", url).json()
 
 
 def get_interaction_message_id(application_id: str, interaction_token: str) -> str:
     url = f"{BASE_URL}/webhooks/{application_id}/{interaction_token}/messages/@original"
-    return requests.get(url, headers=HEADERS).json()
-
+    return _request("GET", url).json()
 
-def format_response(body, ephemeral):
-    if isinstance(body, str):
-        response = {"content": body, "flags": 64 if ephemeral else 128}
-    else:
-        content = body.get("content")
-        embeds = body.get("embeds")
-        components = body.get("components")
-        response = {
-            "content": content,
-            "embeds": embeds,
-            "allowed_mentions": [],
-            "flags": 64 if ephemeral else None,
-            "components": components,
-        }
 
-    return response
+def _send_followups(application_id, interaction_token, messages, ephemeral=False):
+    # one POST per message, in order; the limiter keeps them inside the webhook bucket
+    url = f"{BASE_URL}/webhooks/{application_id}/{interaction_token}"
+    for message in messages:
+        _request("POST", url, json=format_response(message, ephemeral=ephemeral))
 
 
 def send_followup(application_id, interaction_token, content, ephemeral=False):
-    while len(content) > MAX_RESPONSE_LENGTH:
-        send_followup(application_id, interaction_token, content[:MAX_RESPONSE_LENGTH])
-        content = content[MAX_RESPONSE_LENGTH:]
-
-    body = format_response(content, ephemeral=ephemeral)
-    url = f"{BASE_URL}/webhooks/{application_id}/{interaction_token}"
-    requests.post(url, json=body, headers=HEADERS)
+    messages = packer.pack(content)
+    _send_followups(application_id, interaction_token, messages, ephemeral=ephemeral)
 
 
 def update_response(application_id, interaction_token, content, ephemeral=False):
-    remaining = ""
-    # TODO FIX FOR DICT CONTENT
-    if len(content) > MAX_RESPONSE_LENGTH:
-        content, remaining = (
-            content[:MAX_RESPONSE_LENGTH],
-            content[MAX_RESPONSE_LENGTH:],
-        )
+    # the original message gets as much as fits, the rest goes out as followups
+    first, *remaining = packer.pack(content)
 
-    body = format_response(content, ephemeral=ephemeral)
+    body = format_response(first, ephemeral=ephemeral)
     url = f"{BASE_URL}/webhooks/{application_id}/{interaction_token}/messages/@original"
-    requests.patch(url, json=body, headers=HEADERS)
+    _request("PATCH", url, json=body)
 
-    if remaining:
-        send_followup(application_id, interaction_token, remaining)
+    _send_followups(application_id, interaction_token, remaining)
 
 
 def delete_response(application_id, interaction_token):
     url = f"{BASE_URL}/webhooks/{application_id}/{interaction_token}/messages/@original"
-    requests.delete(url, headers=HEADERS)
+    _request("DELETE", url)
 
 
 def send_response(channel_id, content, embeds=None, ephemeral=False):
@@ -313,7 +390,7 @@ def send_response(channel_id, content, embeds=None, ephemeral=False):
         embeds = []
     body = format_response({"content": content, "embeds": embeds}, ephemeral=ephemeral)
     url = f"{BASE_URL}/channels/{channel_id}/messages"
-    response = requests.post(url, json=body, headers=HEADERS)
+    response = _request("POST", url, json=body)
 
     return response
 
@@ -321,7 +398,7 @@ def send_response(channel_id, content, embeds=None, ephemeral=False):
 def edit_message(channel_id, message_id, output):
     response = format_response(output, ephemeral=False)
     url = f"{BASE_URL}/channels/{channel_id}/messages/{message_id}"
-    response = requests.patch(url, json=response, headers=HEADERS)
+    response = _request("PATCH", url, json=response)
 
     return response
 
@@ -334,13 +411,13 @@ def send_component_response(interaction_id, interaction_token, content=None):
         body = {"type": InteractionsCallbackType.CHANNEL_MESSAGE_WITH_SOURCE}
         body["data"] = content
     url = f"{BASE_URL}/interactions/{interaction_id}/{interaction_token}/callback"
-    requests.post(url, json=body, headers=HEADERS)
+    _request("POST", url, json=body)
 
 
 # Event related
 def create_server_event(server_id: str, event_details: dict) -> None:
     url = f"{BASE_URL}/guilds/{server_id}/scheduled-events"
-    return requests.post(url, json=event_details, headers=HEADERS)
+    return _request("POST", url, json=event_details)
 
 
 # Emote related
@@ -352,14 +429,14 @@ def create_emoji(server_id, emoji_name, image_format, image_data):
     }
 
     url = f"{BASE_URL}/guilds/{server_id}/emojis"
-    return requests.post(url, json=emoji, headers=HEADERS)
+    return _request("POST", url, json=emoji)
 
 
 def react_to_message(channel_id, message_id, emoji):
     url = (
         f"{BASE_URL}/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"
     )
-    return requests.put(url, headers=HEADERS)
+    return _request("PUT", url)
 
 
 def delete_self_react(channel_id, message_id, emoji):
@@ -367,26 +444,10 @@ def delete_self_react(channel_id, message_id, emoji):
         f"{BASE_URL}/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me"
     )
 
-    return requests.delete(url, headers=HEADERS)
+    return _request("DELETE", url)
 
 
 # Misc
-def initial_response(response_type, content=None, ephemeral=False):
-    response = {
-        "type": RESPONSE_TYPES[response_type]
-        if response_type in RESPONSE_TYPES
-        else RESPONSE_TYPES["MESSAGE_WITH_SOURCE"],
-    }
-    if response_type != "PONG":  # and "ACK" not in response_type:
-        response["data"] = {
-            "content": content,
-            "embeds": [],
-            "allowed_mentions": [],
-            "flags": 64 if ephemeral else None,
-        }
-    return response
-
-
 def format_time(timestamp: Union[int, str], format: str = "F") -> str:
     return f"<t:{int(timestamp)}:{format}>"
 
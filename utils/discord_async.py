@@ -0,0 +1,101 @@
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import discord, http, memo
+
+# asyncio flavour of utils/discord.py, for fanning out independent calls.
+# Every call runs the sync helper on a small thread pool, so it goes through the
+# same pooled session and the same rate limiter as everything else; the pool is
+# no bigger than the session's connection pool so connections are never dropped.
+
+DEFAULT_CONCURRENCY = 5
+
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=http.DEFAULT_POOL_SIZE, thread_name_prefix="discord"
+)
+
+
+async def run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # run_in_context so the pool threads see this invocation's memo scope
+    return await loop.run_in_executor(
+        _EXECUTOR, memo.run_in_context(functools.partial(func, *args, **kwargs))
+    )
+
+
+def _async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+
+    return wrapper
+
+
+async def gather_bounded(awaitables, limit=DEFAULT_CONCURRENCY):
+    """asyncio.gather, but with at most `limit` awaitables in flight."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(bounded(awaitable) for awaitable in awaitables))
+
+
+def fan_out(calls, limit=DEFAULT_CONCURRENCY):
+    """Runs zero-arg callables concurrently from sync code; returns their results.
+
+    Falls back to running them in order if there's only one call, or if this
+    thread already has an event loop running.
+    """
+    calls = list(calls)
+    try:
+        asyncio.get_running_loop()
+        loop_running = True
+    except RuntimeError:
+        loop_running = False
+
+    if len(calls) <= 1 or loop_running:
+        return [call() for call in calls]
+
+    async def main():
+        return await gather_bounded([run(call) for call in calls], limit=limit)
+
+    return asyncio.run(main())
+
+
+# Channel-related
+get_channel_by_id = _async(discord.get_channel_by_id)
+get_server_channels = _async(discord.get_server_channels)
+create_thread = _async(discord.create_thread)
+archive_thread = _async(discord.archive_thread)
+get_thread_members = _async(discord.get_thread_members)
+add_thread_member = _async(discord.add_thread_member)
+remove_thread_member = _async(discord.remove_thread_member)
+
+# Role-related
+add_role = _async(discord.add_role)
+remove_role = _async(discord.remove_role)
+get_user_role_ids = _async(discord.get_user_role_ids)
+get_user_role_names = _async(discord.get_user_role_names)
+get_user_nickname_by_id = _async(discord.get_user_nickname_by_id)
+is_admin = _async(discord.is_admin)
+
+# Message related
+post_message_in_channel = _async(discord.post_message_in_channel)
+delete_message = _async(discord.delete_message)
+get_message_by_id = _async(discord.get_message_by_id)
+send_followup = _async(discord.send_followup)
+update_response = _async(discord.update_response)
+delete_response = _async(discord.delete_response)
+send_response = _async(discord.send_response)
+edit_message = _async(discord.edit_message)
+
+# Event related
+create_server_event = _async(discord.create_server_event)
+
+# Emote related
+react_to_message = _async(discord.react_to_message)
+delete_self_react = _async(discord.delete_self_react)
@@ -0,0 +1,169 @@
+import threading
+import time
+
+from nacl.signing import VerifyKey
+
+from commands.inline import INLINE_COMMANDS, INLINE_COMPONENTS
+from constants.interactions import INPUT_PARSERS, InteractionsType
+from utils import packer, ssm
+
+# Everything the dispatcher lambda needs from discord, kept apart from
+# utils/discord.py so the dispatcher doesn't import requests or the REST client.
+
+PING_PONG = {"type": 1}
+
+RESPONSE_TYPES = {
+    "PONG": 1,
+    "ACK_NO_SOURCE": 2,
+    "MESSAGE_NO_SOURCE": 3,
+    "MESSAGE_WITH_SOURCE": 4,
+    "ACK_WITH_SOURCE": 5,
+    "DEFERRED_UPDATE_MESSAGE": 6,
+    "UPDATE_MESSAGE": 7,
+    "MODAL": 9,
+}
+
+_VERIFY_KEY = None
+
+
+# Verification related
+def verify_key() -> VerifyKey:
+    """The discord public key, parsed once per process."""
+    global _VERIFY_KEY
+    if _VERIFY_KEY is None:
+        _VERIFY_KEY = VerifyKey(bytes.fromhex(ssm.get_parameter(ssm.DISCORD_PUBLIC_KEY)))
+    return _VERIFY_KEY
+
+
+def verify_signature(event):
+    raw_body = event.get("rawBody")
+    auth_sig = event["params"]["header"].get("x-signature-ed25519")
+    auth_ts = event["params"]["header"].get("x-signature-timestamp")
+    message = auth_ts.encode() + raw_body.encode()
+
+    try:
+        verify_key().verify(message, bytes.fromhex(auth_sig))
+    except Exception as e:
+        raise Exception(f"[UNAUTHORIZED] Invalid request signature: {e}")
+
+
+def _ping_pong(body):
+    if body.get("type") == 1:
+        return True
+    return False
+
+
+def check_input(event):
+    verify_signature(event)
+    body = event.get("body-json")
+    if _ping_pong(body):
+        return PING_PONG
+
+
+# Misc
+def initial_response(response_type, content=None, ephemeral=False):
+    response = {
+        "type": RESPONSE_TYPES[response_type]
+        if response_type in RESPONSE_TYPES
+        else RESPONSE_TYPES["MESSAGE_WITH_SOURCE"],
+    }
+    if response_type != "PONG":  # and "ACK" not in response_type:
+        response["data"] = {
+            "content": content,
+            "embeds": [],
+            "allowed_mentions": [],
+            "flags": 64 if ephemeral else None,
+        }
+    return response
+
+
+def format_response(body, ephemeral):
+    if isinstance(body, str):
+        response = {"content": body, "flags": 64 if ephemeral else 128}
+    else:
+        content = body.get("content")
+        embeds = body.get("embeds")
+        components = body.get("components")
+        response = {
+            "content": content,
+            "embeds": embeds,
+            "allowed_mentions": [],
+            "flags": 64 if ephemeral else None,
+            "components": components,
+        }
+
+    return response
+
+
+# Inline answers
+def _inline_budget(body):
+    data = body.get("data", {})
+    if body["type"] == InteractionsType.APPLICATION_COMMAND:
+        return INLINE_COMMANDS.get(data.get("name", "").lower())
+    if body["type"] == InteractionsType.MESSAGE_COMPONENT:
+        return INLINE_COMPONENTS.get(data.get("custom_id"))
+    return None
+
+
+def _run_processor(body, result):
+    # command_handler pulls in requests, boto3 etc.; only inline-capable
+    # interactions pay for that here
+    from utils import registry
+
+    command_handler = registry.load_module("command_handler")
+    if body["type"] == InteractionsType.APPLICATION_COMMAND:
+        handle = command_handler.handle_command
+    else:
+        handle = command_handler.handle_component_interaction
+
+    try:
+        result["output"] = handle(INPUT_PARSERS[body["type"]](body))
+    except Exception as e:
+        result["error"] = e
+
+
+def answer_inline(body, ephemeral=False):
+    """The full type 4/7 response if `body` is inline-capable and its handler
+    finished within budget, otherwise None (defer to the processor)."""
+    budget = _inline_budget(body)
+    if budget is None:
+        return None
+
+    start = time.perf_counter()
+    result = {}
+    # daemon thread so an over-budget handler doesn't hold up the response;
+    # whatever it was doing gets repeated by the processor
+    worker = threading.Thread(target=_run_processor, args=(body, result), daemon=True)
+    worker.start()
+    worker.join(budget)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if worker.is_alive():
+        print(f"Inline answer over its {budget}s budget, deferring")
+        return None
+    if "error" in result:
+        print(f"Inline answer failed after {elapsed:.1f}ms, deferring: {result['error']}")
+        return None
+
+    output = result.get("output")
+    messages = packer.pack(output) if output else []
+    if len(messages) != 1:
+        # empty output means deleting the original, long output means followups;
+        # both are the processor's job
+        return None
+    output = messages[0]
+
+    print(f"Answered inline in {elapsed:.1f}ms")
+    if isinstance(output, str):
+        # the plain string format sets the loading flag, which only makes sense
+        # when patching a deferred response
+        output = {"content": output}
+    if body["type"] == InteractionsType.MESSAGE_COMPONENT:
+        return {
+            "type": RESPONSE_TYPES["UPDATE_MESSAGE"],
+            "data": format_response(output, ephemeral=False),
+        }
+    return {
+        "type": RESPONSE_TYPES["MESSAGE_WITH_SOURCE"],
+        "data": format_response(output, ephemeral=ephemeral),
+    }
@@ -1,102 +1,537 @@
+import copy
+import functools
+import itertools
+import queue
+import random
+import threading
+import time
+
 import boto3
 
 from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from utils import cache, memo, metrics
 
 PKEY_NAME = "pk"
 # GENERAL_TABLE = "lost-ark-guild-bot"
 
 dynamodb_client = boto3.resource("dynamodb")
 
+# reads are memoized per invocation (utils/memo.py); every write below drops the
+# memoized reads of its table
+
+# Single rows read by pk are also kept for the whole (warm) process, per table
+# for ITEM_CACHE_TTL seconds; tables not listed aren't cached. Our own updates
+# write the new row through. Reads that must see other containers' writes
+# (memo.bypass()/memo.fresh(), e.g. coalesced renders) skip the cache.
+#
+# Every update bumps the row's VERSION_COLUMN. Read-modify-write callers read
+# with get_versioned_row (always from dynamodb) and hand the version back to
+# set_rows, which then raises StaleRowError instead of writing if anyone else
+# wrote the row in between; read it again and recompute. VERSION_COLUMN never
+# shows up in rows returned from here.
+ITEM_CACHE_TTL = {
+    "lost_ark_schedule": 30,
+    "lost_ark_generic": 10,
+    "lost_ark_words": 60,
+}
+VERSION_COLUMN = "_v"
+_ITEMS = cache.TTLCache(maxsize=512)
+
+SCAN_BUFFERED_PAGES = 2  # per segment, in parallel scans
+
+# dynamodb's per-request limit for BatchGetItem
+BATCH_GET_LIMIT = 100
+# unprocessed keys are retried after ~BATCH_BACKOFF * 2**attempt seconds
+BATCH_RETRIES = 5
+BATCH_BACKOFF = 0.05
+
+
+class StaleRowError(Exception):
+    """The row changed since the version the write was computed from."""
+
+
+def new_resource():
+    # boto3 resources aren't thread safe, so each parallel scan segment gets its own
+    return boto3.session.Session().resource("dynamodb")
+
+
+_THREAD = threading.local()
+
+
+def _resource():
+    # same for long-lived threads (worker.py lanes, utils/discord_async.py's pool):
+    # one resource per thread, made on its first call; the main thread (all of the
+    # lambda) keeps using dynamodb_client
+    if threading.current_thread() is threading.main_thread():
+        return dynamodb_client
+    if getattr(_THREAD, "resource", None) is None:
+        _THREAD.resource = new_resource()
+    return _THREAD.resource
+
+
+def _table(table_name: str):
+    # every call on the table is timed per invocation (utils/metrics.py)
+    return metrics.instrument(_resource().Table(table_name), "dynamodb", table_name)
+
+
+def _invalidate(table_name: str):
+    memo.invalidate("dynamodb", lambda tag: tag == table_name)
+
+
+def _strip(row: dict) -> dict:
+    row.pop(VERSION_COLUMN, None)
+    return row
+
+
+def _project(row: dict, projection: list) -> dict:
+    if not projection:
+        return row
+    return {column: row[column] for column in [PKEY_NAME, *projection] if column in row}
+
+
+def _cached(table_name: str, pkey_value: str):
+    """The row as this process last saw it (version included), or None."""
+    if table_name not in ITEM_CACHE_TTL or memo.bypassed():
+        return None
+    row = _ITEMS.get((table_name, pkey_value))
+    metrics.count("item_cache_hits" if row is not None else "item_cache_misses")
+    return copy.deepcopy(row)
+
+
+def _remember(table_name: str, pkey_value: str, row: dict):
+    if table_name in ITEM_CACHE_TTL:
+        _ITEMS.set((table_name, pkey_value), copy.deepcopy(row), ttl=ITEM_CACHE_TTL[table_name])
+
+
+def _forget(table_name: str, pkey_value: str):
+    _ITEMS.pop((table_name, pkey_value))
+
+
+def item_cache_stats() -> dict:
+    """Process-wide hits/misses/hit_rate/size of the row cache."""
+    return _ITEMS.stats()
+
+
+def _projection_kwargs(projection: list) -> dict:
+    # only these columns (and the pk, which every row keeps) come back; names go
+    # through #p placeholders so reserved words are fine
+    if not projection:
+        return {}
+    columns = list(dict.fromkeys([PKEY_NAME, *projection]))
+    return {
+        "ProjectionExpression": ", ".join(f"#p{i}" for i in range(len(columns))),
+        "ExpressionAttributeNames": {f"#p{i}": column for i, column in enumerate(columns)},
+    }
+
 
+def _read_kwargs(
+    filterExpression: str, expressionAttributeValues: dict, projection: list = None
+) -> dict:
+    kwargs = _projection_kwargs(projection)
+    if filterExpression:
+        kwargs["FilterExpression"] = filterExpression
+    if expressionAttributeValues:
+        kwargs["ExpressionAttributeValues"] = expressionAttributeValues
+    return kwargs
+
+
+def _pages(call, kwargs: dict, page_size: int = None):
+    # follows LastEvaluatedKey, one request per page, only as far as it's iterated
+    kwargs = dict(kwargs)
+    if page_size:
+        kwargs["Limit"] = page_size
+    while True:
+        response = call(**kwargs)
+        yield [_strip(row) for row in response["Items"]]
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def _put(pages: queue.Queue, item, stop: threading.Event) -> bool:
+    # blocks while the reader is behind, but gives up once it's gone
+    while not stop.is_set():
+        try:
+            pages.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _parallel_scan(table_name: str, kwargs: dict, page_size: int, segments: int):
+    pages = queue.Queue(maxsize=segments * SCAN_BUFFERED_PAGES)
+    stop = threading.Event()
+    finished = object()
+
+    def scan_segment(segment):
+        try:
+            table = metrics.instrument(
+                new_resource().Table(table_name), "dynamodb", table_name
+            )
+            segment_kwargs = {**kwargs, "Segment": segment, "TotalSegments": segments}
+            for page in _pages(table.scan, segment_kwargs, page_size):
+                if not _put(pages, page, stop):
+                    return
+        except Exception as e:
+            _put(pages, e, stop)
+        finally:
+            _put(pages, finished, stop)
+
+    for segment in range(segments):
+        threading.Thread(
+            target=memo.run_in_context(functools.partial(scan_segment, segment)),
+            name=f"scan-{table_name}-{segment}",
+            daemon=True,
+        ).start()
+
+    try:
+        running = segments
+        while running:
+            page = pages.get()
+            if page is finished:
+                running -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        # stops the other segments if the caller stopped early or one failed
+        stop.set()
+
+
+def iter_query(
+    table_name: str,
+    key_condition: dict,
+    index: str = None,
+    filterExpression: str = "",
+    expressionAttributeValues: dict = None,
+    page_size: int = None,
+    limit: int = None,
+    projection: list = None,
+):
+    """Yields matching rows page by page, up to `limit` of them.
+
+    key_condition is {key attribute: value} for the table or `index`; with
+    `projection`, rows only have those columns (plus the pk).
+    """
+    condition = None
+    for name, value in key_condition.items():
+        condition = Key(name).eq(value) if condition is None else condition & Key(name).eq(value)
+    kwargs = {
+        "KeyConditionExpression": condition,
+        **_read_kwargs(filterExpression, expressionAttributeValues, projection),
+    }
+    if index:
+        kwargs["IndexName"] = index
+
+    pages = _pages(_table(table_name).query, kwargs, page_size)
+    yield from itertools.islice(itertools.chain.from_iterable(pages), limit)
+
+
+def iter_scan(
+    table_name: str,
+    filterExpression: str = "",
+    expressionAttributeValues: dict = None,
+    page_size: int = None,
+    limit: int = None,
+    segments: int = 1,
+    projection: list = None,
+):
+    """Yields matching rows page by page, up to `limit` of them.
+
+    With segments > 1, the table is scanned as that many segments in parallel
+    threads; rows then come in no particular order. `projection` as for iter_query.
+    """
+    kwargs = _read_kwargs(filterExpression, expressionAttributeValues, projection)
+    if segments > 1:
+        rows = _parallel_scan(table_name, kwargs, page_size, segments)
+    else:
+        rows = itertools.chain.from_iterable(
+            _pages(_table(table_name).scan, kwargs, page_size)
+        )
+    try:
+        yield from itertools.islice(rows, limit)
+    finally:
+        if segments > 1:
+            rows.close()
+
+
+@memo.memoized("dynamodb")
 def query_index(
     table_name: str,
     index: str,
     key_condition: dict,
     filterExpression: str = "",
     expressionAttributeValues: dict = {},
+    projection: list = None,
 ):
-    table = dynamodb_client.Table(table_name)
-    if filterExpression:
-        response = table.query(
-            IndexName=index,
-            KeyConditionExpression=Key(list(key_condition.keys())[0]).eq(
-                list(key_condition.values())[0]
-            ),
-            FilterExpression=filterExpression,
-            ExpressionAttributeValues=expressionAttributeValues,
-        )
-    else:
-        response = table.query(
-            IndexName=index,
-            KeyConditionExpression=Key(list(key_condition.keys())[0]).eq(
-                list(key_condition.values())[0]
-            ),
+    return list(
+        iter_query(
+            table_name,
+            key_condition,
+            index=index,
+            filterExpression=filterExpression,
+            expressionAttributeValues=expressionAttributeValues,
+            projection=projection,
         )
-    return response["Items"]
+    )
 
 
+@memo.memoized("dynamodb")
 def get_rows(
     table_name: str,
     pkey_value: str = None,
     filterExpression: str = "",
     expressionAttributeValues: dict = {},
+    segments: int = 1,
+    projection: list = None,
 ):
-    table = dynamodb_client.Table(table_name)
-
     if pkey_value:
         if filterExpression:
-            response = table.query(
-                KeyConditionExpression=Key(PKEY_NAME).eq(pkey_value),
-                FilterExpression=filterExpression,
-                ExpressionAttributeValues=expressionAttributeValues,
+            return list(
+                iter_query(
+                    table_name,
+                    {PKEY_NAME: pkey_value},
+                    filterExpression=filterExpression,
+                    expressionAttributeValues=expressionAttributeValues,
+                    projection=projection,
+                )
             )
-            return response["Items"]
         else:
-            response = table.get_item(Key={PKEY_NAME: pkey_value})
-            if response and "Item" in response:
-                return [response["Item"]]
-            else:
-                return []
+            row = _get_item(table_name, pkey_value, projection)
+            return [row] if row is not None else []
 
-    # otherwise, scan
-    if filterExpression:
-        response = table.scan(
-            FilterExpression=filterExpression,
-            ExpressionAttributeValues=expressionAttributeValues,
+    # otherwise, scan (every page of it)
+    return list(
+        iter_scan(
+            table_name,
+            filterExpression=filterExpression,
+            expressionAttributeValues=expressionAttributeValues,
+            segments=segments,
+            projection=projection,
         )
-        return response["Items"]
+    )
 
-    return table.scan()["Items"]
 
+def _get_item(table_name: str, pkey_value: str, projection: list = None):
+    row = _cached(table_name, pkey_value)
+    if row is not None:
+        return _project(_strip(row), projection)
 
-def set_rows(table_name: str, pkey_value: str, new_column: dict):
-    table = dynamodb_client.Table(table_name)
-    existing_rows = get_rows(table_name, pkey_value)
-    if not existing_rows:
-        new_column[PKEY_NAME] = pkey_value
-        table.put_item(Item=new_column)
+    if table_name in ITEM_CACHE_TTL:
+        # the whole row, so the cached copy can answer any projection
+        projection_kwargs = {}
     else:
-        for k, v in new_column.items():
-            for _ in existing_rows:
-                table.update_item(
-                    Key={PKEY_NAME: pkey_value},
-                    UpdateExpression=f"set {k}=:s",
-                    ExpressionAttributeValues={":s": v},
-                )
+        projection_kwargs = _projection_kwargs(projection)
+    response = _table(table_name).get_item(Key={PKEY_NAME: pkey_value}, **projection_kwargs)
+    if not response or "Item" not in response:
+        return None
+
+    row = response["Item"]
+    _remember(table_name, pkey_value, row)
+    return _project(_strip(row), projection)
+
+
+def get_versioned_row(table_name: str, pkey_value: str):
+    """(row or None, version) for read-modify-write, always read from dynamodb.
+
+    Pass the version on to set_rows with the values computed from the row.
+    """
+    response = _table(table_name).get_item(Key={PKEY_NAME: pkey_value}, ConsistentRead=True)
+    if not response or "Item" not in response:
+        return None, 0
+
+    row = response["Item"]
+    _remember(table_name, pkey_value, row)
+    return _strip(dict(row)), int(row.get(VERSION_COLUMN, 0))
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _pending(request_items: dict) -> int:
+    return sum(len(request["Keys"]) for request in request_items.values())
+
+
+def _batch(call, request_items: dict, unprocessed: str, on_response=None):
+    # sends request_items, then whatever dynamodb hands back as unprocessed
+    # (throttling, 16 MB responses) until nothing is left; gives up after
+    # BATCH_RETRIES rounds in a row that got nothing through
+    attempt, stalled = 0, 0
+    while True:
+        pending = _pending(request_items)
+        response = call(RequestItems=request_items)
+        if on_response:
+            on_response(response)
+        request_items = response.get(unprocessed) or {}
+        if not request_items:
+            return
+
+        stalled = stalled + 1 if _pending(request_items) >= pending else 0
+        if stalled > BATCH_RETRIES:
+            raise RuntimeError(
+                f"dynamodb left {unprocessed} after {BATCH_RETRIES} retries: {list(request_items)}"
+            )
+        attempt += 1
+        metrics.count("retries")
+        time.sleep(random.uniform(0, BATCH_BACKOFF * 2 ** min(attempt, BATCH_RETRIES)))
+
+
+@memo.memoized("dynamodb")
+def batch_get_rows(table_name: str, pkey_values: list, projection: list = None) -> dict:
+    """{pkey: row} for the pkeys that exist, in as few BatchGetItems as possible."""
+    rows, missing = {}, []
+    for pkey in dict.fromkeys(pkey_values):
+        row = _cached(table_name, pkey)
+        if row is not None:
+            rows[pkey] = _project(_strip(row), projection)
+        else:
+            missing.append(pkey)
+
+    def collect(response):
+        for row in response.get("Responses", {}).get(table_name, []):
+            _remember(table_name, row[PKEY_NAME], row)
+            rows[row[PKEY_NAME]] = _project(_strip(row), projection)
+
+    # whole rows for cached tables, as in _get_item
+    projection_kwargs = {} if table_name in ITEM_CACHE_TTL else _projection_kwargs(projection)
+    resource = metrics.instrument(_resource(), "dynamodb", table_name)
+    for chunk in _chunks(missing, BATCH_GET_LIMIT):
+        request = {
+            table_name: {
+                "Keys": [{PKEY_NAME: pkey} for pkey in chunk],
+                **projection_kwargs,
+            }
+        }
+        _batch(resource.batch_get_item, request, "UnprocessedKeys", collect)
+    return rows
+
+
+def _update(
+    table_name: str,
+    pkey_value: str,
+    actions: list,
+    names: dict,
+    values: dict,
+    version: int = None,
+) -> dict:
+    """UpdateItem with the given SET actions that bumps the row's version and
+    writes the new row through to the cache; returns it (version stripped).
+
+    With a version (from get_versioned_row), raises StaleRowError instead if the
+    row isn't at that version anymore.
+    """
+    table = _table(table_name)
+    names = {**names, "#v": VERSION_COLUMN}
+    values = {**values, ":zero": 0, ":one": 1}
+    kwargs = {
+        "Key": {PKEY_NAME: pkey_value},
+        "UpdateExpression": "SET " + ", ".join([*actions, "#v = if_not_exists(#v, :zero) + :one"]),
+        "ExpressionAttributeNames": names,
+        "ExpressionAttributeValues": values,
+        "ReturnValues": "ALL_NEW",
+    }
+
+    if version:
+        kwargs["ConditionExpression"] = "#v = :held"
+        kwargs["ExpressionAttributeValues"] = {**values, ":held": version}
+    elif version is not None:
+        # version 0: the row was missing or never versioned
+        kwargs["ConditionExpression"] = "attribute_not_exists(#v)"
+
+    try:
+        response = table.update_item(**kwargs)
+    except ClientError as e:
+        if version is None or not _condition_failed(e):
+            raise
+        # the values were computed from an older row, so writing them now would
+        # lose whatever the other writer did; that's the caller's call to redo
+        metrics.count("stale_items")
+        _forget(table_name, pkey_value)
+        raise StaleRowError(f"{table_name} row {pkey_value} changed since version {version}")
+    finally:
+        _invalidate(table_name)
+
+    row = response["Attributes"]
+    _remember(table_name, pkey_value, row)
+    return _strip(row)
+
+
+def _set_expression(columns: dict):
+    # placeholders for every name and value, so reserved words (status, time,
+    # user, ...) and odd characters in column names are fine
+    names, values, actions = {}, {}, []
+    for i, (column, value) in enumerate(columns.items()):
+        names[f"#c{i}"] = column
+        values[f":v{i}"] = value
+        actions.append(f"#c{i} = :v{i}")
+    return actions, names, values
+
+
+def set_rows(
+    table_name: str,
+    pkey_value: str,
+    new_column: dict,
+    return_values: bool = False,
+    version: int = None,
+):
+    """Sets the given columns on the row in one UpdateItem, creating it if missing.
+
+    With return_values, returns the whole row as it is after the update. With a
+    version from get_versioned_row, raises StaleRowError (writing nothing) if the
+    row changed since.
+    """
+    columns = {k: v for k, v in new_column.items() if k not in (PKEY_NAME, VERSION_COLUMN)}
+    row = _update(table_name, pkey_value, *_set_expression(columns), version=version)
+    if return_values:
+        return row
+
+
+def update_counters(
+    table_name: str,
+    pkey_value: str,
+    deltas: dict,
+    defaults: dict = None,
+    set_columns: dict = None,
+    copy_columns: dict = None,
+) -> dict:
+    """Adds deltas[column] to each counter on the row in one UpdateItem.
+
+    Missing rows and counters start from defaults[column] (0 if not given).
+    set_columns are set on the row in the same update, and each copy_columns
+    {target: source} gets source's value from before it (0 if it had none).
+    Returns {column: value after the update} for the counters and targets.
+    """
+    defaults = defaults or {}
+    names, values, actions = {}, {}, []
+    for i, (column, delta) in enumerate(deltas.items()):
+        names[f"#c{i}"] = column
+        values[f":d{i}"] = defaults.get(column, 0)
+        values[f":n{i}"] = delta
+        actions.append(f"#c{i} = if_not_exists(#c{i}, :d{i}) + :n{i}")
+    for i, (column, value) in enumerate((set_columns or {}).items()):
+        names[f"#s{i}"] = column
+        values[f":s{i}"] = value
+        actions.append(f"#s{i} = :s{i}")
+    # (every right-hand side in one UpdateExpression sees the row as it was)
+    for i, (target, source) in enumerate((copy_columns or {}).items()):
+        names[f"#t{i}"] = target
+        names[f"#f{i}"] = source
+        actions.append(f"#t{i} = if_not_exists(#f{i}, :zero)")
+
+    # counter updates commute, so another container's writes don't matter here
+    # (ALL_NEW brings the cached copy up to date either way)
+    row = _update(table_name, pkey_value, actions, names, values)
+    return {column: row[column] for column in [*deltas, *(copy_columns or {})]}
 
 
 def increment_counter(table_name: str, pkey_value: str, column_name: str):
-    table = dynamodb_client.Table(table_name)
-    existing_rows = get_rows(table_name, pkey_value)
-    if not existing_rows:
-        new_column = {PKEY_NAME: pkey_value, column_name: 1}
-        table.put_item(Item=new_column)
-    else:
-        table.update_item(
-            Key={PKEY_NAME: pkey_value},
-            UpdateExpression=f"ADD {column_name} :inc",
-            ExpressionAttributeValues={":inc": 1},
-        )
+    return update_counters(table_name, pkey_value, {column_name: 1})[column_name]
 
 
 def decrement_counter(
@@ -106,19 +541,82 @@ def decrement_counter(
     default_start: int = 0,
     decrement: int = 1,
 ):
-    table = dynamodb_client.Table(table_name)
-    existing_rows = get_rows(table_name, pkey_value)
-    if not existing_rows:
-        new_column = {PKEY_NAME: pkey_value, column_name: default_start}
-        table.put_item(Item=new_column)
-    else:
-        table.update_item(
-            Key={PKEY_NAME: pkey_value},
-            UpdateExpression=f"ADD {column_name} :inc",
-            ExpressionAttributeValues={":inc": -1 * decrement},
-        )
+    # a missing counter is set to default_start, without the decrement, as before
+    return update_counters(
+        table_name,
+        pkey_value,
+        {column_name: -1 * decrement},
+        {column_name: default_start + decrement},
+    )[column_name]
 
 
 def delete_item(table_name: str, pkey_value: str):
-    table = dynamodb_client.Table(table_name)
+    table = _table(table_name)
+    _forget(table_name, pkey_value)
     table.delete_item(Key={PKEY_NAME: pkey_value})
+    _invalidate(table_name)
+
+
+def delete_row_if(table_name: str, pkey_value: str, column_name: str, expected) -> bool:
+    """Deletes the row only if its column_name is still `expected`; False otherwise."""
+    table = _table(table_name)
+    _forget(table_name, pkey_value)
+    try:
+        table.delete_item(
+            Key={PKEY_NAME: pkey_value},
+            ConditionExpression="#c = :expected",
+            ExpressionAttributeNames={"#c": column_name},
+            ExpressionAttributeValues={":expected": expected},
+        )
+    except ClientError as e:
+        if _condition_failed(e):
+            return False
+        raise
+    finally:
+        _invalidate(table_name)
+    return True
+
+
+def _condition_failed(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+def put_new_row(table_name: str, pkey_value: str, columns: dict) -> bool:
+    """Creates the row only if pkey_value doesn't exist yet; False if it did."""
+    table = _table(table_name)
+    _forget(table_name, pkey_value)
+    try:
+        table.put_item(
+            Item={**columns, PKEY_NAME: pkey_value},
+            ConditionExpression="attribute_not_exists(#pk)",
+            ExpressionAttributeNames={"#pk": PKEY_NAME},
+        )
+    except ClientError as e:
+        if _condition_failed(e):
+            return False
+        raise
+    finally:
+        _invalidate(table_name)
+    return True
+
+
+def replace_row_if(
+    table_name: str, pkey_value: str, columns: dict, column_name: str, expected
+) -> bool:
+    """Overwrites the row only if its column_name is still `expected`; False otherwise."""
+    table = _table(table_name)
+    _forget(table_name, pkey_value)
+    try:
+        table.put_item(
+            Item={**columns, PKEY_NAME: pkey_value},
+            ConditionExpression="#c = :expected",
+            ExpressionAttributeNames={"#c": column_name},
+            ExpressionAttributeValues={":expected": expected},
+        )
+    except ClientError as e:
+        if _condition_failed(e):
+            return False
+        raise
+    finally:
+        _invalidate(table_name)
+    return True
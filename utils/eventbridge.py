@@ -2,10 +2,11 @@ import boto3
 import datetime
 import json
 from constants.common import SELF_ARN, SCHEDULE_GROUP
+from utils import metrics
 
 EVENTBRIDGE_ROLE = "arn:aws:iam::391107963258:role/eventbridge_reminders_role"
 TIMEZONE = "America/Los_Angeles"
-eventbridge_client = boto3.client('scheduler')
+eventbridge_client = metrics.instrument(boto3.client('scheduler'), "scheduler", "scheduler")
 
 INFO_TEMPLATE = {
     "source": "aws.events",
@@ -3,6 +3,14 @@ import time
 
 from functools import wraps
 from enum import Enum
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+
+from utils import metrics
+
+# (connect, read) in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_POOL_SIZE = 10
 
 EXCEPTIONS_TO_CATCH = (ConnectionError, TimeoutError,
                        requests.exceptions.HTTPError,
@@ -41,6 +49,21 @@ def retry(retries=3, backoff=2, backoff_factor=2):
     return retry_decorator
 
 
+def new_session(headers=None, pool_size=DEFAULT_POOL_SIZE):
+    """Returns a requests session with a keep-alive connection pool.
+
+    Module-level sessions survive across warm lambda invocations, so only the
+    first call per host pays for the TCP+TLS handshake.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
 # TODO exc carryover bug
 # @retry()
 def make_request(method,
@@ -50,11 +73,15 @@ def make_request(method,
                  params=None,
                  headers=None,
                  timeout=5):
-    r = requests.request(method,
-                         url,
-                         data=data,
-                         json=json,
-                         params=params,
-                         headers=headers)
+    parts = urlsplit(url)
+    with metrics.timed("http", f"{method} {parts.netloc}{parts.path}") as call:
+        r = requests.request(method,
+                             url,
+                             data=data,
+                             json=json,
+                             params=params,
+                             headers=headers)
+        call["status"] = r.status_code
+        call["bytes"] = len(r.content)
     r.raise_for_status()
     return r.json()
@@ -0,0 +1,127 @@
+import json
+import time
+import uuid
+
+from utils import dynamodb, memo
+
+# The processor is invoked asynchronously, so the same interaction can reach it
+# more than once (lambda's own retries, a re-sent dispatcher invoke). The first
+# invocation to claim an interaction id does the work; repeats see the claim
+# and skip it, returning the first run's output if it was small enough to keep.
+#
+# A claim is a lease: if its owner died without finishing or releasing it, the
+# next repeat after LEASE seconds takes it over. Records expire through the
+# table's ttl attribute (EXPIRES_COLUMN).
+
+IDEMPOTENCY_TABLE = "lost_ark_generic"
+# (not "interaction:{}": bully/compliments keep their punch records under that)
+INTERACTION_PKEY = "processed:{}"
+STATE_COLUMN = "state"
+OWNER_COLUMN = "owner"
+LEASE_COLUMN = "lease_expires"
+RESULT_COLUMN = "result"
+EXPIRES_COLUMN = "expires_at"
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+LEASE = 15 * 60  # seconds, the processor's max runtime
+TTL = 24 * 60 * 60  # seconds; discord interaction tokens are dead by then anyway
+MAX_RESULT_BYTES = 32 * 1024
+
+
+class Claim:
+    def __init__(self, interaction_id, owner=None, row=None):
+        self.interaction_id = interaction_id
+        self.owner = owner
+        self.row = row or {}
+
+    @property
+    def duplicate(self) -> bool:
+        return self.owner is None
+
+    @property
+    def in_progress(self) -> bool:
+        return self.row.get(STATE_COLUMN) == IN_PROGRESS
+
+    @property
+    def result(self):
+        """The first run's output, if it finished and kept it; else None."""
+        stored = self.row.get(RESULT_COLUMN)
+        return json.loads(stored) if stored is not None else None
+
+
+def _pkey(interaction_id) -> str:
+    return INTERACTION_PKEY.format(interaction_id)
+
+
+def _lease_row(owner: str) -> dict:
+    now = int(time.time())
+    return {
+        STATE_COLUMN: IN_PROGRESS,
+        OWNER_COLUMN: owner,
+        LEASE_COLUMN: now + LEASE,
+        EXPIRES_COLUMN: now + TTL,
+    }
+
+
+def _current_row(interaction_id):
+    # written by other invocations, so never answered from the memo
+    with memo.bypass():
+        rows = dynamodb.get_rows(IDEMPOTENCY_TABLE, _pkey(interaction_id))
+    return rows[0] if rows else None
+
+
+def claim(interaction_id) -> Claim:
+    """Claims interaction_id for this invocation; check `.duplicate` on the result."""
+    owner = uuid.uuid4().hex
+    pkey = _pkey(interaction_id)
+    if dynamodb.put_new_row(IDEMPOTENCY_TABLE, pkey, _lease_row(owner)):
+        return Claim(interaction_id, owner)
+
+    row = _current_row(interaction_id)
+    if row is None:
+        # expired or released between the put and the read; try once more
+        if dynamodb.put_new_row(IDEMPOTENCY_TABLE, pkey, _lease_row(owner)):
+            return Claim(interaction_id, owner)
+        return Claim(interaction_id, row=_current_row(interaction_id))
+
+    if row.get(STATE_COLUMN) == IN_PROGRESS and int(row[LEASE_COLUMN]) < time.time():
+        # the owner died holding the lease; take over unless someone beat us to it
+        if dynamodb.replace_row_if(
+            IDEMPOTENCY_TABLE, pkey, _lease_row(owner), OWNER_COLUMN, row[OWNER_COLUMN]
+        ):
+            return Claim(interaction_id, owner)
+        row = _current_row(interaction_id)
+
+    return Claim(interaction_id, row=row)
+
+
+def complete(claim: Claim, output):
+    """Marks the claim done, keeping output for repeats if it's small enough."""
+    try:
+        stored = json.dumps(output)
+    except (TypeError, ValueError):
+        stored = None
+    if stored is not None and len(stored.encode()) > MAX_RESULT_BYTES:
+        stored = None
+
+    row = {
+        STATE_COLUMN: DONE,
+        OWNER_COLUMN: claim.owner,
+        EXPIRES_COLUMN: int(time.time()) + TTL,
+    }
+    if stored is not None:
+        row[RESULT_COLUMN] = stored
+    # if our lease ran out and someone took over, their run wins
+    dynamodb.replace_row_if(
+        IDEMPOTENCY_TABLE, _pkey(claim.interaction_id), row, OWNER_COLUMN, claim.owner
+    )
+
+
+def release(claim: Claim):
+    """Drops the claim after a failure, so a retry does the work again."""
+    # unless our lease ran out and someone else took over; that claim is theirs
+    dynamodb.delete_row_if(
+        IDEMPOTENCY_TABLE, _pkey(claim.interaction_id), OWNER_COLUMN, claim.owner
+    )
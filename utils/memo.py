@@ -0,0 +1,156 @@
+import contextlib
+import contextvars
+import copy
+import functools
+import inspect
+import json
+import threading
+
+# Read-through memo scoped to one invocation: identical reads inside a
+# `with memo.scope():` block hit the backend once. Entries are tagged (dynamodb
+# by table, discord by url path) and our own writes drop the matching tags, so a
+# read after a write always goes back to the backend. Outside a scope nothing is
+# memoized. What it saved is reported in the invocation's metrics line.
+#
+# Threads started with run_in_context (utils/discord_async.py) share the scope.
+
+_SCOPE = contextvars.ContextVar("memo_scope", default=None)
+_BYPASS = contextvars.ContextVar("memo_bypass", default=False)
+
+
+class _Memo:
+    def __init__(self):
+        self.entries = {}  # (namespace, tag, key) -> value
+        self.hits = {}
+        self.misses = {}
+        self.lock = threading.Lock()
+
+    def stats(self):
+        return {
+            namespace: {"saved": self.hits.get(namespace, 0), "calls": misses}
+            for namespace, misses in self.misses.items()
+        }
+
+
+@contextlib.contextmanager
+def scope():
+    memo = _Memo()
+    token = _SCOPE.set(memo)
+    try:
+        yield memo
+    finally:
+        _SCOPE.reset(token)
+
+
+@contextlib.contextmanager
+def bypass():
+    """Reads inside this block always go to the backend (and aren't memoized)."""
+    token = _SCOPE.set(None)
+    try:
+        with fresh():
+            yield
+    finally:
+        _SCOPE.reset(token)
+
+
+@contextlib.contextmanager
+def fresh():
+    """Reads inside this block skip process-level caches (utils/dynamodb.py's
+    rows), which check bypassed(); the per-invocation memo still applies."""
+    token = _BYPASS.set(True)
+    try:
+        yield
+    finally:
+        _BYPASS.reset(token)
+
+
+def bypassed() -> bool:
+    return _BYPASS.get()
+
+
+def clear():
+    """Forgets everything memoized so far, e.g. after waiting on other invocations."""
+    memo = _SCOPE.get()
+    if memo is not None:
+        with memo.lock:
+            memo.entries.clear()
+
+
+def stats() -> dict:
+    """{namespace: {"saved", "calls"}} for the current scope."""
+    memo = _SCOPE.get()
+    return memo.stats() if memo else {}
+
+
+def run_in_context(func):
+    """Wraps func so it runs in (a copy of) the caller's context, scope included."""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+
+def key(*args, **kwargs) -> str:
+    return json.dumps([args, kwargs], sort_keys=True, default=str)
+
+
+def read(namespace: str, tag: str, read_key, fetch, copy_result=True, keep=None):
+    """fetch(), or what it returned the last time for (namespace, tag, read_key).
+
+    Results are deep-copied on the way in and out unless copy_result is False,
+    so callers can't mutate each other's rows. `keep(result)` decides whether a
+    result is worth memoizing (e.g. only successful responses).
+    """
+    memo = _SCOPE.get()
+    if memo is None:
+        return fetch()
+
+    entry_key = (namespace, tag, read_key)
+    with memo.lock:
+        if entry_key in memo.entries:
+            memo.hits[namespace] = memo.hits.get(namespace, 0) + 1
+            value = memo.entries[entry_key]
+            return copy.deepcopy(value) if copy_result else value
+
+    value = fetch()
+    with memo.lock:
+        memo.misses[namespace] = memo.misses.get(namespace, 0) + 1
+        if keep is None or keep(value):
+            memo.entries[entry_key] = copy.deepcopy(value) if copy_result else value
+    return value
+
+
+def invalidate(namespace: str, matches):
+    """Drops entries in namespace whose tag satisfies matches(tag)."""
+    memo = _SCOPE.get()
+    if memo is None:
+        return
+
+    with memo.lock:
+        for entry_key in [
+            entry_key
+            for entry_key in memo.entries
+            if entry_key[0] == namespace and matches(entry_key[1])
+        ]:
+            del memo.entries[entry_key]
+
+
+def memoized(namespace: str):
+    """Decorator for read functions whose first argument is the tag (e.g. table)."""
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(tag, *args, **kwargs):
+            # positional or keyword, defaulted or not: same read, same key
+            arguments = signature.bind(tag, *args, **kwargs)
+            arguments.apply_defaults()
+            return read(
+                namespace,
+                tag,
+                key(func.__name__, arguments.arguments),
+                lambda: func(tag, *args, **kwargs),
+            )
+
+        return wrapper
+
+    return decorator
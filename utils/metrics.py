@@ -0,0 +1,148 @@
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+
+# Per-invocation record of every outbound call (discord, dynamodb, ssm, lambda,
+# scheduler, plain http): backend, route template, status, bytes and latency.
+# command_handler.lambda_handler wraps each invocation in `invocation(...)`,
+# which prints one json summary line at the end for CloudWatch Logs Insights.
+# Outside an invocation nothing is recorded.
+#
+# Threads started with memo.run_in_context (utils/discord_async.py) record into
+# the same invocation.
+
+_INVOCATION = contextvars.ContextVar("metrics_invocation", default=None)
+
+
+class _Invocation:
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.calls = []
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def add(self, call):
+        with self.lock:
+            self.calls.append(call)
+
+    def count(self, counter, n=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def summary(self, error=None):
+        backends = {}
+        for call in self.calls:
+            backend = backends.setdefault(
+                call["backend"], {"calls": 0, "ms": 0.0, "bytes": 0, "errors": 0}
+            )
+            backend["calls"] += 1
+            backend["ms"] += call["ms"]
+            backend["bytes"] += call["bytes"] or 0
+            if call["error"] or (isinstance(call["status"], int) and call["status"] >= 400):
+                backend["errors"] += 1
+        for backend in backends.values():
+            backend["ms"] = round(backend["ms"], 1)
+
+        return {
+            "metric": "invocation",
+            "type": self.kind,
+            "name": self.name,
+            "ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "error": error,
+            "backends": backends,
+            **self.counters,
+            "calls": [
+                [call["backend"], call["route"], call["status"], call["bytes"], round(call["ms"], 1)]
+                for call in self.calls
+            ],
+        }
+
+
+@contextlib.contextmanager
+def invocation(name: str, kind: str, extra=None):
+    """Records outbound calls made inside the block; prints the summary line on exit.
+
+    `extra()` is called right before printing and merged into the summary.
+    """
+    record = _Invocation(name, kind)
+    token = _INVOCATION.set(record)
+    error = None
+    try:
+        yield record
+    except Exception as e:
+        error = repr(e)
+        raise
+    finally:
+        _INVOCATION.reset(token)
+        summary = record.summary(error)
+        if extra:
+            summary.update(extra())
+        print(json.dumps(summary, separators=(",", ":"), default=str))
+
+
+def count(counter: str, n=1):
+    """Bumps a per-invocation counter (e.g. retries); shows up in the summary."""
+    record = _INVOCATION.get()
+    if record is not None:
+        record.count(counter, n)
+
+
+@contextlib.contextmanager
+def timed(backend: str, route: str):
+    """Times one outbound call. Fill in call["status"] / call["bytes"] inside."""
+    call = {"backend": backend, "route": route, "status": None, "bytes": None, "error": None}
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        # botocore errors carry their code in e.response; anything else gets its type
+        response = getattr(e, "response", None)
+        code = response.get("Error", {}).get("Code") if isinstance(response, dict) else None
+        call["error"] = True
+        call["status"] = code or type(e).__name__
+        raise
+    finally:
+        call["ms"] = (time.perf_counter() - start) * 1000
+        record = _INVOCATION.get()
+        if record is not None:
+            record.add(call)
+
+
+def _aws_response(call, response):
+    metadata = response.get("ResponseMetadata", {}) if isinstance(response, dict) else {}
+    call["status"] = metadata.get("HTTPStatusCode")
+    length = metadata.get("HTTPHeaders", {}).get("content-length")
+    call["bytes"] = int(length) if length else None
+
+
+class _Instrumented:
+    """Proxy for a boto3 client/resource: every method call is timed as
+    backend `backend`, route `<prefix>.<method>`."""
+
+    def __init__(self, target, backend, prefix):
+        self._target = target
+        self._backend = backend
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            with timed(self._backend, f"{self._prefix}.{name}") as record:
+                response = attr(*args, **kwargs)
+                _aws_response(record, response)
+                return response
+
+        return call
+
+
+def instrument(target, backend: str, prefix: str):
+    return _Instrumented(target, backend, prefix)
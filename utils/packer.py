@@ -0,0 +1,127 @@
+# Packs handler output (text, or a dict with content/embeds/components) into as
+# few discord messages as its limits allow. Long text is split on newlines where
+# possible; oversized embeds are split into continuation embeds.
+# https://discord.com/developers/docs/resources/channel#embed-object-embed-limits
+
+MAX_CONTENT_LENGTH = 2000
+MAX_DESCRIPTION_LENGTH = 4096
+MAX_FIELD_LENGTH = 1024
+MAX_FIELDS = 25
+MAX_EMBEDS = 10
+MAX_EMBEDS_LENGTH = 6000  # all embeds in one message, combined
+
+# discord rejects fields with an empty name
+CONTINUATION_FIELD_NAME = "\u200b"
+
+
+def split_text(text: str, limit: int) -> list:
+    """Splits text into chunks of at most `limit` characters, preferring to cut
+    at a newline in the second half of a chunk."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", limit // 2, limit + 1)
+        if cut == -1:
+            chunks.append(text[:limit])
+            text = text[limit:]
+        else:
+            chunks.append(text[:cut])
+            text = text[cut + 1 :]
+    chunks.append(text)
+    return chunks
+
+
+def _field_value(field: dict) -> str:
+    # handlers put numbers in fields too (vote counts); 0 is a value, not empty
+    return str(field.get("value", ""))
+
+
+def embed_length(embed: dict) -> int:
+    """Characters that count towards MAX_EMBEDS_LENGTH."""
+    return (
+        len(embed.get("title") or "")
+        + len(embed.get("description") or "")
+        + len((embed.get("footer") or {}).get("text") or "")
+        + len((embed.get("author") or {}).get("name") or "")
+        + sum(
+            len(field.get("name") or "") + len(_field_value(field))
+            for field in embed.get("fields") or []
+        )
+    )
+
+
+def _continuation(embed):
+    continuation = {}
+    if "color" in embed:
+        continuation["color"] = embed["color"]
+    return continuation
+
+
+def _split_fields(fields):
+    for field in fields:
+        for i, value in enumerate(split_text(_field_value(field), MAX_FIELD_LENGTH)):
+            piece = dict(field, value=value)
+            if i:
+                piece["name"] = CONTINUATION_FIELD_NAME
+            yield piece
+
+
+def split_embed(embed: dict) -> list:
+    """Splits one embed into embeds that are each within discord's limits."""
+    descriptions = split_text(embed.get("description") or "", MAX_DESCRIPTION_LENGTH)
+
+    first = {key: value for key, value in embed.items() if key != "fields"}
+    if embed.get("description"):
+        first["description"] = descriptions[0]
+    pieces = [first]
+    for description in descriptions[1:]:
+        pieces.append(dict(_continuation(embed), description=description))
+
+    current = pieces[-1]
+    current_length = embed_length(current)
+    for field in _split_fields(embed.get("fields") or []):
+        field_length = embed_length({"fields": [field]})
+        if (
+            len(current.get("fields", [])) == MAX_FIELDS
+            or current_length + field_length > MAX_EMBEDS_LENGTH
+        ):
+            current = _continuation(embed)
+            current_length = 0
+            pieces.append(current)
+        current.setdefault("fields", []).append(field)
+        current_length += field_length
+
+    return pieces
+
+
+def pack(output) -> list:
+    """Splits output into the fewest messages discord will accept, in order.
+
+    Text comes back as a list of strings; a dict comes back as a list of
+    {"content", "embeds"} dicts, with any components on the first one.
+    """
+    if isinstance(output, str):
+        return split_text(output, MAX_CONTENT_LENGTH)
+
+    messages = [
+        {"content": chunk or None, "embeds": []}
+        for chunk in split_text(output.get("content") or "", MAX_CONTENT_LENGTH)
+    ]
+
+    current = messages[-1]
+    current_length = 0
+    for embed in output.get("embeds") or []:
+        for piece in split_embed(embed):
+            piece_length = embed_length(piece)
+            if (
+                len(current["embeds"]) == MAX_EMBEDS
+                or current_length + piece_length > MAX_EMBEDS_LENGTH
+            ):
+                current = {"content": None, "embeds": []}
+                current_length = 0
+                messages.append(current)
+            current["embeds"].append(piece)
+            current_length += piece_length
+
+    if output.get("components") is not None:
+        messages[0]["components"] = output["components"]
+    return messages
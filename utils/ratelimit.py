@@ -0,0 +1,153 @@
+import re
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+# discord rate limits are per bucket, and a bucket is shared by every route that
+# reports the same X-RateLimit-Bucket hash *and* has the same major parameters
+# (channel, guild or webhook). https://discord.com/developers/docs/topics/rate-limits
+
+_API_PREFIX = re.compile(r"^/api(?:/v\d+)?")
+_SNOWFLAKE = re.compile(r"^\d+$")
+_MAJOR_RESOURCES = ("channels", "guilds")
+
+
+def route_key(method: str, url: str) -> tuple:
+    """Returns (route, major) for a request.
+
+    route is the method + path template, e.g.
+    `PATCH /channels/{channel_id}/messages/{id}`; major is the part of the path
+    discord buckets on, e.g. `channels/123`.
+    """
+    path = _API_PREFIX.sub("", urlsplit(url).path)
+    parts = path.strip("/").split("/")
+
+    major = ""
+    template = []
+    i = 0
+    while i < len(parts):
+        part = parts[i]
+        if not major and part in _MAJOR_RESOURCES and i + 1 < len(parts):
+            major = f"{part}/{parts[i + 1]}"
+            template += [part, f"{{{part[:-1]}_id}}"]
+            i += 2
+            continue
+        if not major and part == "webhooks" and i + 2 < len(parts):
+            major = f"webhooks/{parts[i + 1]}/{parts[i + 2]}"
+            template += [part, "{webhook_id}", "{webhook_token}"]
+            i += 3
+            continue
+        if part == "interactions" and i + 2 < len(parts):
+            # interaction callbacks aren't bound by the bot's buckets
+            template += [part, "{interaction_id}", "{interaction_token}"]
+            i += 3
+            continue
+        if _SNOWFLAKE.match(part):
+            part = "{id}"
+        elif template and template[-1] == "reactions":
+            part = "{emoji}"
+        template.append(part)
+        i += 1
+
+    return f"{method.upper()} /{'/'.join(template)}", major
+
+
+class _Bucket:
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = 0.0
+
+
+class RateLimiter:
+    """Tracks discord rate limit buckets so requests wait instead of 429ing.
+
+    Shared by every thread in the process; sleeping happens outside the lock.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._bucket_hashes = {}
+        self._buckets = {}
+        self._global_reset_at = 0.0
+        self.waited = 0.0
+        self.retries = 0
+
+    def _bucket(self, route, major):
+        bucket_hash = self._bucket_hashes.get(route, route)
+        key = (bucket_hash, major)
+        if key not in self._buckets:
+            self._buckets[key] = _Bucket()
+        return self._buckets[key]
+
+    def _reserve(self, route, major) -> float:
+        """Takes a slot in the bucket if one is free; else returns the wait."""
+        now = self._clock()
+        with self._lock:
+            if self._global_reset_at > now:
+                return self._global_reset_at - now
+
+            bucket = self._bucket(route, major)
+            if bucket.reset_at <= now:
+                # window rolled over; discord will tell us the new remaining
+                bucket.remaining = None
+            if bucket.remaining is None:
+                return 0.0
+            if bucket.remaining > 0:
+                bucket.remaining -= 1
+                return 0.0
+            return bucket.reset_at - now
+
+    def acquire(self, route_and_major: tuple, deadline: float) -> bool:
+        """Blocks until the request may be sent. False if that's past deadline."""
+        route, major = route_and_major
+        while True:
+            delay = self._reserve(route, major)
+            if delay <= 0:
+                return True
+            if self._clock() + delay > deadline:
+                return False
+            self.waited += delay
+            self._sleep(delay)
+
+    def update(self, route_and_major: tuple, response):
+        """Records rate limit headers; returns retry_after if this was a 429."""
+        route, major = route_and_major
+        headers = response.headers
+        now = self._clock()
+
+        with self._lock:
+            bucket_hash = headers.get("X-RateLimit-Bucket")
+            if bucket_hash:
+                self._bucket_hashes[route] = bucket_hash
+            bucket = self._bucket(route, major)
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                bucket.remaining = int(remaining)
+                bucket.reset_at = now + float(reset_after)
+
+            if response.status_code != 429:
+                return None
+
+            retry_after = _retry_after(response)
+            is_global = (
+                headers.get("X-RateLimit-Global", "").lower() == "true"
+                or headers.get("X-RateLimit-Scope") == "global"
+            )
+            if is_global:
+                self._global_reset_at = max(self._global_reset_at, now + retry_after)
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+            return retry_after
+
+
+def _retry_after(response) -> float:
+    try:
+        return float(response.json()["retry_after"])
+    except Exception:
+        return float(response.headers.get("Retry-After", 1))
@@ -0,0 +1,123 @@
+import importlib
+import sys
+import time
+
+# Handler modules are imported the first time something routes to them, so an
+# invocation only pays for the imports (PIL, bs4, honing data, ...) it uses.
+# IMPORT_TIMES records what each first import cost in this process.
+
+IMPORT_TIMES = {}
+
+
+def load_module(module_name: str):
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+
+    IMPORT_TIMES[module_name] = elapsed
+    print(f"Imported {module_name} in {elapsed * 1000:.1f}ms")
+    return module
+
+
+def lazy(module_name: str, attr: str):
+    """Returns a function that calls module_name.attr, importing it on first use."""
+
+    def call(*args, **kwargs):
+        return getattr(load_module(module_name), attr)(*args, **kwargs)
+
+    call.__qualname__ = call.__name__ = f"{module_name}.{attr}"
+    return call
+
+
+def import_report() -> dict:
+    """First-import cost of each handler module loaded so far, slowest first."""
+    return {
+        module_name: round(elapsed * 1000, 1)
+        for module_name, elapsed in sorted(
+            IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True
+        )
+    }
+
+
+class Router:
+    """Maps names to handlers, by exact name or by prefix.
+
+    Built once at import; lookups are a dict hit or a walk down a prefix trie
+    (one step per character of the name). Registering a name twice, a prefix
+    that overlaps another prefix, or a name that a prefix would also match
+    raises ValueError right away instead of surfacing on some later request.
+    """
+
+    _HANDLER = None  # trie nodes keep their handler under this key
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._exact = {}
+        self._trie = {}
+
+    def add(self, name: str, handler):
+        existing = self._exact.get(name)
+        if existing is not None and existing is not handler:
+            raise ValueError(f"Duplicate {self.kind} handler for `{name}`")
+
+        prefix_handler = self._match_prefix(name)
+        if prefix_handler is not None:
+            raise ValueError(
+                f"Ambiguous {self.kind} `{name}`: also matches prefix handler {prefix_handler.__qualname__}"
+            )
+
+        self._exact[name] = handler
+
+    def add_all(self, names, handler):
+        for name in names:
+            self.add(name, handler)
+
+    def add_prefix(self, prefix: str, handler):
+        if not prefix:
+            raise ValueError(f"Empty {self.kind} prefix")
+
+        node = self._trie
+        for char in prefix[:-1]:
+            node = node.setdefault(char, {})
+            if self._HANDLER in node:
+                raise ValueError(
+                    f"Ambiguous {self.kind} prefix `{prefix}`: overlaps a shorter prefix"
+                )
+        node = node.setdefault(prefix[-1], {})
+
+        existing = node.get(self._HANDLER)
+        if existing is not None and existing is not handler:
+            raise ValueError(f"Duplicate {self.kind} prefix handler for `{prefix}`")
+        if any(key is not self._HANDLER for key in node):
+            raise ValueError(
+                f"Ambiguous {self.kind} prefix `{prefix}`: overlaps a longer prefix"
+            )
+
+        clashes = [name for name in self._exact if name.startswith(prefix)]
+        if clashes:
+            raise ValueError(
+                f"Ambiguous {self.kind} prefix `{prefix}`: also matches {clashes}"
+            )
+
+        node[self._HANDLER] = handler
+
+    def _match_prefix(self, name: str):
+        node = self._trie
+        for char in name:
+            node = node.get(char)
+            if node is None:
+                return None
+            if self._HANDLER in node:
+                return node[self._HANDLER]
+        return None
+
+    def resolve(self, name: str):
+        """The handler for `name`, or None."""
+        handler = self._exact.get(name)
+        if handler is None:
+            handler = self._match_prefix(name)
+        return handler
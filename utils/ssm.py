@@ -0,0 +1,114 @@
+import json
+import os
+import threading
+import time
+
+from utils import metrics
+
+# SSM parameters (secrets), resolved on first use instead of at import time.
+# Everything asked for together is fetched in one get_parameters round trip, then
+# kept in-process and in /tmp (which outlives the process within a lambda sandbox)
+# until CACHE_TTL runs out. Lookups show up in the invocation's metrics summary
+# line as ssm_hits (in-process), ssm_tmp_loads and ssm_loads, and the time spent
+# loading (tmp or ssm) as ssm_ms.
+
+REGION = "us-east-2"
+
+DISCORD_PUBLIC_KEY = "/discord/public_key/lost-ark-guild-bot"
+DISCORD_BOT_TOKEN = "/discord/bot_token/lost-ark-guild-bot"
+DISCORD_SECRETS = (DISCORD_PUBLIC_KEY, DISCORD_BOT_TOKEN)
+CACHE_PATH = "/tmp/ssm_parameters.json"
+CACHE_TTL = 60 * 60  # seconds
+
+_PARAMETERS = {}
+_LOCK = threading.Lock()
+_client = None
+
+
+def _ssm_client():
+    global _client
+    if _client is None:
+        # boto3 is slow to import; only pay for it if we actually go to ssm
+        import boto3
+
+        _client = metrics.instrument(
+            boto3.client("ssm", region_name=REGION), "ssm", "ssm"
+        )
+    return _client
+
+
+def _is_fresh(entry, now):
+    return entry is not None and now - entry["fetched_at"] < CACHE_TTL
+
+
+def _read_tmp_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_tmp_cache(parameters):
+    tmp_path = f"{CACHE_PATH}.{os.getpid()}"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(parameters, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"Couldn't cache ssm parameters in {CACHE_PATH}: {e}")
+
+
+def _fetch(names):
+    response = _ssm_client().get_parameters(Names=list(names), WithDecryption=True)
+    if response.get("InvalidParameters"):
+        raise KeyError(f"Unknown ssm parameters: {response['InvalidParameters']}")
+
+    now = time.time()
+    return {
+        parameter["Name"]: {"value": parameter["Value"], "fetched_at": now}
+        for parameter in response["Parameters"]
+    }
+
+
+def _missing(names, parameters, now):
+    return [name for name in names if not _is_fresh(parameters.get(name), now)]
+
+
+def get_parameters(names) -> dict:
+    """Returns {name: value}, fetching anything missing/expired in one call."""
+    names = tuple(names)
+    with _LOCK:
+        now = time.time()
+        missing = _missing(names, _PARAMETERS, now)
+
+        if missing:
+            start = time.perf_counter()
+            source = "tmp"
+
+            on_disk = _read_tmp_cache()
+            for name in missing:
+                if _is_fresh(on_disk.get(name), now):
+                    _PARAMETERS[name] = on_disk[name]
+
+            missing = _missing(names, _PARAMETERS, now)
+            if missing:
+                source = "ssm"
+                _PARAMETERS.update(_fetch(missing))
+                _write_tmp_cache({**on_disk, **_PARAMETERS})
+
+            elapsed = time.perf_counter() - start
+            metrics.count("ssm_loads" if source == "ssm" else "ssm_tmp_loads")
+            metrics.count("ssm_ms", round(elapsed * 1000, 1))
+            print(
+                f"Loaded {len(names)} ssm parameters from {source} in {elapsed * 1000:.1f}ms"
+            )
+        else:
+            metrics.count("ssm_hits")
+
+        return {name: _PARAMETERS[name]["value"] for name in names}
+
+
+def get_parameter(name: str) -> str:
+    return get_parameters([name])[name]
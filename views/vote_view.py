@@ -2,6 +2,8 @@ from typing import List
 
 from views.button import Button
 
+ID_PREFIX = "vote_"
+
 
 class VoteView:
     # self.COMPONENTS = [
@@ -41,7 +43,7 @@ class VoteView:
     def get_buttons(self):
         buttons = []
         for choice in self.choices:
-            buttons.append(vars(Button(custom_id=f"vote_{choice}", label=choice)))
+            buttons.append(vars(Button(custom_id=f"{ID_PREFIX}{choice}", label=choice)))
 
         sorted_buttons = sorted(buttons, key=lambda item: item["label"])
         return self._wrap_in_action_rows(sorted_buttons)
@@ -0,0 +1,219 @@
+"""Long-lived alternative to the processor lambda.
+
+Runs command_handler.lambda_handler on interaction payloads (the same events the
+dispatcher sends the processor) pulled off a queue, in one process that stays
+up, so connection pools and module-level caches (members, roles, channels, ssm
+secrets, imported handlers) stay warm between interactions.
+
+Events are split into lanes (commands/lanes.py: button clicks, fast commands,
+heavy commands, timer events), each with its own queue and concurrency limit, so
+slow commands only ever wait on each other. Per-lane queue depth and wait time
+are printed as a json line every --stats-interval seconds and on shutdown.
+
+The queues are in-process; this entrypoint feeds them one json event per line
+from stdin, and anything else (e.g. an SQS poller) can call Worker.submit.
+SIGTERM/SIGINT or EOF stop intake, finish what's queued and in flight, then exit:
+
+    python worker.py --lane interactive=8 --lane heavy=2 < events.jsonl
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import command_handler
+
+from commands import lanes
+
+DRAIN_TIMEOUT = 30  # seconds
+STATS_INTERVAL = 60  # seconds
+
+
+class _Lane:
+    def __init__(self, name, concurrency):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = None
+        self.consumers = []
+        # handlers are blocking (requests, boto3), so each runs on its own thread;
+        # they can still fan out with utils/discord_async.py from there
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix=f"worker-{name}"
+        )
+        self.in_flight = 0
+        self.processed = 0
+        self.waited = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "depth": self.queue.qsize() if self.queue else 0,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "mean_wait_ms": round(self.waited / self.processed * 1000, 1)
+            if self.processed
+            else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+class Worker:
+    def __init__(
+        self,
+        handler=command_handler.lambda_handler,
+        concurrency=None,
+        lane_for=lanes.lane_for,
+    ):
+        self.handler = handler
+        self.lane_for = lane_for
+        self.accepting = False
+        self.stats = {"submitted": 0, "rejected": 0, "processed": 0, "failed": 0}
+
+        self.lanes = {
+            name: _Lane(name, limit)
+            for name, limit in {**lanes.CONCURRENCY, **(concurrency or {})}.items()
+        }
+        self._loop = None
+
+    def depth(self):
+        return sum(lane.queue.qsize() for lane in self.lanes.values() if lane.queue)
+
+    def lane_stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        for lane in self.lanes.values():
+            lane.queue = asyncio.Queue()
+            lane.consumers = [
+                asyncio.create_task(self._consume(lane)) for _ in range(lane.concurrency)
+            ]
+        self.accepting = True
+
+    def submit(self, event) -> bool:
+        """Queues an event in its lane; False once draining. Call from the worker's loop."""
+        if not self.accepting:
+            self.stats["rejected"] += 1
+            return False
+        self.stats["submitted"] += 1
+        self.lanes[self.lane_for(event)].queue.put_nowait((time.monotonic(), event))
+        return True
+
+    def submit_threadsafe(self, event):
+        """submit() for callers on other threads."""
+        self._loop.call_soon_threadsafe(self.submit, event)
+
+    async def _consume(self, lane):
+        while True:
+            queued_at, event = await lane.queue.get()
+            waited = time.monotonic() - queued_at
+            lane.waited += waited
+            lane.max_wait = max(lane.max_wait, waited)
+            lane.in_flight += 1
+            try:
+                await self._loop.run_in_executor(lane.executor, self.handler, event, None)
+                self.stats["processed"] += 1
+            except Exception as e:
+                # lambda_handler already told the user; just keep going
+                self.stats["failed"] += 1
+                print(f"Worker: {lane.name} interaction failed: {e!r}")
+            finally:
+                lane.in_flight -= 1
+                lane.processed += 1
+                lane.queue.task_done()
+
+    def print_stats(self):
+        print(
+            json.dumps(
+                {"metric": "lanes", **self.stats, "lanes": self.lane_stats()},
+                separators=(",", ":"),
+            )
+        )
+
+    async def report(self, interval=STATS_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.print_stats()
+
+    async def drain(self, timeout=DRAIN_TIMEOUT):
+        """Stops intake, waits for queued and in-flight events, then stops."""
+        self.accepting = False
+        print(f"Worker: draining {self.depth()} queued events")
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(lane.queue.join() for lane in self.lanes.values())),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"Worker: gave up draining after {timeout}s, {self.depth()} events dropped")
+
+        consumers = [task for lane in self.lanes.values() for task in lane.consumers]
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        # anything still running past the timeout gets to finish its call
+        for lane in self.lanes.values():
+            lane.executor.shutdown(wait=True)
+        print(f"Worker: drained in {time.monotonic() - start:.1f}s")
+        self.print_stats()
+
+
+def _feed_stdin(worker, loop, stopping):
+    # runs on a daemon thread so a blocked readline() never holds up shutdown
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            worker.submit_threadsafe(json.loads(line))
+    loop.call_soon_threadsafe(stopping.set)
+
+
+async def run(concurrency=None, drain_timeout=DRAIN_TIMEOUT, stats_interval=STATS_INTERVAL):
+    worker = Worker(concurrency=concurrency)
+    await worker.start()
+    reporter = asyncio.create_task(worker.report(stats_interval))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+
+    threading.Thread(
+        target=_feed_stdin, args=(worker, loop, stopping), daemon=True
+    ).start()
+    await stopping.wait()
+
+    reporter.cancel()
+    await worker.drain(drain_timeout)
+    return worker.stats
+
+
+def _lane_limit(value):
+    name, _, limit = value.partition("=")
+    if name not in lanes.CONCURRENCY or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(
+            f"expected <lane>=<n> with lane one of {', '.join(lanes.CONCURRENCY)}"
+        )
+    return name, int(limit)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument(
+        "--lane",
+        type=_lane_limit,
+        action="append",
+        default=[],
+        help="override a lane's concurrency, e.g. heavy=2",
+    )
+    arg_parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT)
+    arg_parser.add_argument("--stats-interval", type=float, default=STATS_INTERVAL)
+    args = arg_parser.parse_args()
+
+    asyncio.run(run(dict(args.lane), args.drain_timeout, args.stats_interval))